@@ -2,14 +2,23 @@
 AI Agent module for answering questions and generating personalized onboarding plans.
 """
 
+import asyncio
+import functools
+import hashlib
+import importlib.util
 import os
+import re
 import time
-from typing import List, Dict, Optional
-try:
+from collections import OrderedDict
+from itertools import chain
+from string import Template
+from typing import AsyncIterator, Iterable, List, Dict, Optional, Tuple
+
+# dotenv is optional; check for it once instead of relying on an ImportError
+_HAS_DOTENV = importlib.util.find_spec("dotenv") is not None
+if _HAS_DOTENV:
     from dotenv import load_dotenv
     load_dotenv()  # Load environment variables from .env file
-except Exception:
-    pass  # dotenv is optional
 
 # Import OpenAI error classes for better error handling
 try:
@@ -30,322 +39,602 @@ except ImportError:
         class APIConnectionError(Exception):
             pass
 
-# Robust imports for different langchain/openai layouts. If langchain isn't
-# available we provide a minimal fallback that uses the `openai` package so
-# the agent can still run in environments without langchain installed.
+# LLM client classes, resolved lazily by _resolve_llm_backend() on first agent
+# construction so that importing this module doesn't import langchain/openai.
 ChatOpenAI = None
 HumanMessage = None
 SystemMessage = None
-_import_errs = []
-try:
-    # Preferred modern langchain path
-    from langchain_openai import ChatOpenAI
-    from langchain.schema import HumanMessage, SystemMessage
-except Exception as e1:
-    _import_errs.append(("langchain.chat_models", str(e1)))
+
+
+class _ChatOpenAIFallback:
+    """Minimal chat client on top of the `openai` package, used without langchain."""
+    
+    def __init__(self, api_key: str = None, model: str = "gpt-3.5-turbo", temperature: float = 0.7, **kwargs):
+        import httpx
+        from openai import AsyncOpenAI, OpenAI
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.model = model
+        self.temperature = temperature
+        # Keep-alive pools so repeated calls skip TCP/TLS setup
+        self._client = OpenAI(
+            api_key=self.api_key,
+            http_client=httpx.Client(limits=httpx.Limits(max_keepalive_connections=20))
+        )
+        self._aclient = AsyncOpenAI(
+            api_key=self.api_key,
+            http_client=httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=20))
+        )
+
+    @staticmethod
+    def _to_openai_messages(messages) -> List[Dict]:
+        # messages: role/content dicts, or SystemMessage/HumanMessage or simple objects with .content
+        msg_list = []
+        for m in messages:
+            if isinstance(m, dict):
+                msg_list.append(m)
+                continue
+            role = getattr(m, "role", None) or ("system" if m.__class__.__name__.lower().startswith("system") else "user")
+            content = getattr(m, "content", str(m))
+            msg_list.append({"role": role, "content": content})
+        return msg_list
+
+    @staticmethod
+    def _wrap(resp):
+        class _R: pass
+        r = _R()
+        # compatibility with langchain ChatOpenAI response expectations
+        r.content = resp.choices[0].message.content if resp and resp.choices else str(resp)
+        return r
+
+    def invoke(self, messages):
+        resp = self._client.chat.completions.create(
+            model=self.model, messages=self._to_openai_messages(messages), temperature=self.temperature
+        )
+        return self._wrap(resp)
+
+    async def ainvoke(self, messages):
+        resp = await self._aclient.chat.completions.create(
+            model=self.model, messages=self._to_openai_messages(messages), temperature=self.temperature
+        )
+        return self._wrap(resp)
+
+    def __call__(self, messages):
+        return self.invoke(messages)
+
+
+class _FallbackHumanMessage:
+    def __init__(self, content: str):
+        self.content = content
+        self.role = "user"
+
+
+class _FallbackSystemMessage:
+    def __init__(self, content: str):
+        self.content = content
+        self.role = "system"
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_llm_backend() -> Tuple[type, type, type]:
+    """Import the chat client and message classes once and publish them as module globals.
+    
+    Robust imports for different langchain/openai layouts. If langchain isn't
+    available we fall back to a minimal client that uses the `openai` package so
+    the agent can still run in environments without langchain installed.
+    """
+    global ChatOpenAI, HumanMessage, SystemMessage
+    _import_errs = []
     try:
-        # Alternative packaging used by some installs
-        from langchain_openai import ChatOpenAI
-        from langchain_core.messages import HumanMessage, SystemMessage
-    except Exception as e2:
-        _import_errs.append(("langchain_openai", str(e2)))
-        # Last-resort fallback: use openai directly
+        # Preferred modern langchain path
+        from langchain_openai import ChatOpenAI as chat_cls
+        from langchain.schema import HumanMessage as human_cls, SystemMessage as system_cls
+    except Exception as e1:
+        _import_errs.append(("langchain.chat_models", str(e1)))
         try:
-            import openai
-
-            class _ChatOpenAIFallback:
-                def __init__(self, api_key: str = None, model: str = "gpt-3.5-turbo", temperature: float = 0.7, **kwargs):
-                    self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-                    openai.api_key = self.api_key
-                    self.model = model
-                    self.temperature = temperature
-
-                def invoke(self, messages):
-                    # messages: list of SystemMessage/HumanMessage or simple objects with .content
-                    msg_list = []
-                    for m in messages:
-                        role = getattr(m, "role", None) or ("system" if m.__class__.__name__.lower().startswith("system") else "user")
-                        content = getattr(m, "content", str(m))
-                        msg_list.append({"role": role, "content": content})
-                    resp = openai.ChatCompletion.create(model=self.model, messages=msg_list, temperature=self.temperature)
-                    class _R: pass
-                    r = _R()
-                    # compatibility with langchain ChatOpenAI response expectations
-                    r.content = resp.choices[0].message["content"] if resp and resp.choices else str(resp)
-                    return r
-
-                def __call__(self, messages):
-                    return self.invoke(messages)
-
-            ChatOpenAI = _ChatOpenAIFallback
-
-            class HumanMessage:
-                def __init__(self, content: str):
-                    self.content = content
-                    self.role = "user"
-
-            class SystemMessage:
-                def __init__(self, content: str):
-                    self.content = content
-                    self.role = "system"
-
-        except Exception as e3:
-            _import_errs.append(("openai_fallback", str(e3)))
-            raise ImportError(
-                "Could not import a supported LLM client for OnboardingAgent. Tried: " +
-                ", ".join(f"{k}: {v}" for k, v in _import_errs) +
-                ". Ensure 'langchain' or 'langchain_openai' or 'openai' is installed and listed in requirements.txt"
-            ) from e3
+            # Alternative packaging used by some installs
+            from langchain_openai import ChatOpenAI as chat_cls
+            from langchain_core.messages import HumanMessage as human_cls, SystemMessage as system_cls
+        except Exception as e2:
+            _import_errs.append(("langchain_openai", str(e2)))
+            # Last-resort fallback: use openai directly
+            try:
+                from openai import OpenAI  # noqa: F401  (openai>=1.0 client API)
+                chat_cls, human_cls, system_cls = (
+                    _ChatOpenAIFallback, _FallbackHumanMessage, _FallbackSystemMessage
+                )
+            except Exception as e3:
+                _import_errs.append(("openai_fallback", str(e3)))
+                raise ImportError(
+                    "Could not import a supported LLM client for OnboardingAgent. Tried: " +
+                    ", ".join(f"{k}: {v}" for k, v in _import_errs) +
+                    ". Ensure 'langchain' or 'langchain_openai' or 'openai' is installed and listed in requirements.txt"
+                ) from e3
+    
+    ChatOpenAI, HumanMessage, SystemMessage = chat_cls, human_cls, system_cls
+    return chat_cls, human_cls, system_cls
+
+
 from ingest import DocumentIngester
-from db import Database
+from db import Database, get_db
+from semantic_cache import SemanticCache
+
+
+# Retry logic for rate limits and API errors
+MAX_RETRIES = 3
+RETRY_DELAY = 2  # Start with 2 seconds
+RATE_LIMIT_MESSAGE = (
+    "OpenAI API rate limit exceeded. Please wait a moment and try again. "
+    "If this persists, you may need to upgrade your OpenAI plan or reduce request frequency."
+)
+
+GENERAL_ONBOARDING_QUERY = "employee onboarding checklist tasks"
+
+# Minimum cosine similarity for serving a cached answer
+ANSWER_CACHE_THRESHOLD = 0.92
+
+# How long a cached answer is served; the cache is also cleared whenever
+# documents are added to or deleted from the knowledge base
+ANSWER_CACHE_TTL = 60 * 60  # seconds
+
+# Prompt templates are compiled once at import; only the variables are
+# substituted per request.
+ANSWER_SYSTEM_PROMPT = """You are an AI Employee Onboarding Assistant. Your role is to help new employees understand company policies, procedures, and their onboarding process. Always provide accurate, helpful answers based on the provided context. If the context doesn't contain enough information, say so clearly."""
+
+EMPLOYEE_INFO_TEMPLATE = Template("""
+Employee Information:
+- Name: $name
+- Role: $role
+- Department: $department
+""")
+
+ANSWER_USER_TEMPLATE = Template("""Based on the following company documents and information, please answer this question: $question
+
+$employee_info
+
+Relevant Context from Company Documents:
+$context
+
+Please provide a clear, comprehensive answer. At the end, list the sources you used (document names and page numbers).""")
+
+PLAN_SYSTEM_PROMPT = """You are an AI Employee Onboarding Assistant specialized in creating personalized onboarding plans. Create comprehensive, structured onboarding plans that help new employees integrate smoothly into the company."""
+
+PLAN_USER_TEMPLATE = Template("""Create a personalized onboarding plan for a new employee with the following information:
+
+Employee Details:
+- Name: $name
+- Role: $role
+- Department: $department
+- Start Date: $start_date
+
+Relevant Context from Company Documents:
+$context
+
+Please create a comprehensive onboarding plan that includes:
+1. Week-by-week breakdown of activities
+2. Specific tasks and milestones
+3. Required training sessions
+4. Key people to meet
+5. Resources and documentation to review
+6. Department-specific requirements
+
+Format the response as a structured plan with clear phases (Week 1, Week 2, etc.) and actionable tasks.
+Write the employee's name and start date exactly as the placeholders $name and $start_date; they are filled in afterwards.""")
+
+# Plans are generated once per (role, department) with these placeholders in
+# place of the employee's name and start date, then personalized per hire.
+NAME_PLACEHOLDER = "{{NAME}}"
+START_DATE_PLACEHOLDER = "{{START_DATE}}"
+
+# How long a generated plan is reused for the same role and department
+PLAN_TEMPLATE_TTL = 24 * 60 * 60  # seconds
+# Least recently used role/department plans are evicted beyond this many
+PLAN_TEMPLATE_CACHE_SIZE = 128
+
+# Plan parsing: a phase header is a line starting with "Week N", "Phase N",
+# "Day N" or "Month N" (optionally after markdown "#"/"**"); a task is a
+# bulleted or numbered line.
+_PHASE_RE = re.compile(
+    r'^[ \t]*(?:#{1,6}[ \t]*)?(?:\*\*|__)?(?:week|phase|day|month)s?[ \t]*\d+[^\n]*',
+    re.IGNORECASE | re.MULTILINE
+)
+_TASK_RE = re.compile(r'^[ \t]*(?:[-•*]|\d+[.)])[ \t]+(.*\S)', re.MULTILINE)
+
+_SOURCE_BLOCK = "[Source: {}, Page {}]\n{}".format
+# (source, page) shown when a chunk's metadata lacks them
+_NO_META = ('Unknown', 'N/A')
+
+
+def _source_and_page(metadata: Dict) -> Tuple:
+    """Return a chunk's (source, page), falling back to _NO_META."""
+    if not metadata:
+        return _NO_META
+    get = metadata.get
+    return get('source') or _NO_META[0], get('page') or _NO_META[1]
+
+
+def _format_context(results: Iterable[Dict]) -> str:
+    """Join knowledge base results into a prompt context block."""
+    return "\n\n".join(
+        _SOURCE_BLOCK(*_source_and_page(r['metadata']), r['text'])
+        for r in results
+    )
+
+
+def _context_and_citations(results: List[Dict]) -> Tuple[str, List[Dict]]:
+    """Build the prompt context block and the citation list in a single pass."""
+    parts = []
+    citations = []
+    add_part = parts.append
+    add_citation = citations.append
+    for r in results:
+        source, page = _source_and_page(r['metadata'])
+        add_part(_SOURCE_BLOCK(source, page, r['text']))
+        distance = r['distance']
+        add_citation({
+            'source': source,
+            'page': page,
+            'relevance_score': 1 - distance if distance else None
+        })
+    return "\n\n".join(parts), citations
+
+
+@functools.lru_cache(maxsize=None)
+def _default_ingester() -> DocumentIngester:
+    """Process-wide knowledge base client shared by agents that aren't given one."""
+    return DocumentIngester()
+
+
+@functools.lru_cache(maxsize=8)
+def _get_chat_model(api_key: str, model_name: str, temperature: float):
+    """Return a shared chat client for the given key/model/temperature.
+    
+    The client owns an HTTP connection pool, so agents built with the same
+    configuration reuse it instead of paying connection and TLS setup again.
+    """
+    try:
+        # Newer langchain API
+        return ChatOpenAI(
+            api_key=api_key,
+            model=model_name,
+            temperature=temperature
+        )
+    except TypeError:
+        # Fallback for older versions
+        return ChatOpenAI(
+            openai_api_key=api_key,
+            model_name=model_name,
+            temperature=temperature
+        )
 
 
 class OnboardingAgent:
     """AI agent for handling onboarding queries and plan generation."""
     
-    def __init__(self, openai_api_key: str = None, model_name: str = "gpt-3.5-turbo"):
-        """Initialize the AI agent."""
+    def __init__(self, openai_api_key: str = None, model_name: str = "gpt-3.5-turbo",
+                 ingester: Optional[DocumentIngester] = None, db: Optional[Database] = None):
+        """Initialize the AI agent.
+        
+        ingester and db default to process-wide shared instances, so creating
+        an agent per request doesn't reopen the vector store.
+        """
         self.api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OpenAI API key is required. Set OPENAI_API_KEY environment variable.")
         
-        try:
-            # Newer langchain API
-            self.llm = ChatOpenAI(
-                api_key=self.api_key,
-                model=model_name,
-                temperature=0.7
-            )
-        except TypeError:
-            # Fallback for older versions
-            self.llm = ChatOpenAI(
-                openai_api_key=self.api_key,
-                model_name=model_name,
-                temperature=0.7
-            )
+        chat_cls, _, _ = _resolve_llm_backend()
+        self._uses_langchain = chat_cls is not _ChatOpenAIFallback
+        self.llm = _get_chat_model(self.api_key, model_name, 0.7)
         
-        self.ingester = DocumentIngester()
-        self.db = Database()
+        self.ingester = ingester if ingester is not None else _default_ingester()
+        self.db = db if db is not None else get_db()
+        self.answer_cache = SemanticCache(threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL)
+        self._answer_cache_kb_version = DocumentIngester.kb_version
+        # (role, department) -> (created_at, kb_digest, plan_text with placeholders)
+        self._plan_template_cache: "OrderedDict[Tuple[str, str], Tuple[float, str, str]]" = OrderedDict()
     
     def answer_question(self, question: str, employee_context: Dict = None) -> Dict:
         """Answer onboarding-related questions with citations."""
+        # Serve semantically equivalent questions from the cache
+        kb_version = self._sync_answer_cache()
+        scope = self._answer_cache_scope(employee_context)
+        q_emb = self._embed_question(question)
+        if q_emb is not None:
+            cached = self.answer_cache.lookup(q_emb, scope)
+            if cached is not None:
+                return dict(cached)
+        
         # Query knowledge base
-        kb_results = self.ingester.query_knowledge_base(question, n_results=5)
+        kb_results = self.ingester.query_knowledge_base(question, n_results=5, query_embedding=q_emb)
         
-        # Build context from knowledge base results
-        context = "\n\n".join([
-            f"[Source: {r['metadata'].get('source', 'Unknown')}, Page {r['metadata'].get('page', 'N/A')}]\n{r['text']}"
-            for r in kb_results
-        ])
+        context, citations = _context_and_citations(kb_results)
+        messages = self._build_answer_messages(question, employee_context, context)
+        answer = self._invoke_llm(messages)
         
+        result = self._build_answer_result(answer, citations)
+        self._cache_answer(q_emb, result, scope, kb_version)
+        return result
+    
+    async def aanswer_question(self, question: str, employee_context: Dict = None) -> Dict:
+        """Async variant of answer_question that awaits the LLM instead of blocking."""
+        kb_version = self._sync_answer_cache()
+        scope = self._answer_cache_scope(employee_context)
+        q_emb = await asyncio.to_thread(self._embed_question, question)
+        if q_emb is not None:
+            cached = self.answer_cache.lookup(q_emb, scope)
+            if cached is not None:
+                return dict(cached)
+        
+        kb_results = await self.ingester.aquery_knowledge_base(question, n_results=5, query_embedding=q_emb)
+        
+        context, citations = _context_and_citations(kb_results)
+        messages = self._build_answer_messages(question, employee_context, context)
+        answer = await self._ainvoke_llm(messages)
+        
+        result = self._build_answer_result(answer, citations)
+        self._cache_answer(q_emb, result, scope, kb_version)
+        return result
+    
+    def _sync_answer_cache(self) -> int:
+        """Drop cached answers if the knowledge base changed; returns the current version."""
+        kb_version = DocumentIngester.kb_version
+        if kb_version != self._answer_cache_kb_version:
+            self.answer_cache.clear()
+            self._answer_cache_kb_version = kb_version
+        return kb_version
+    
+    def _cache_answer(self, q_emb: Optional[List[float]], result: Dict, scope,
+                      kb_version: int):
+        """Cache an answer unless it had no context or the KB changed while it was built."""
+        if q_emb is None or not result['context_used']:
+            return
+        if kb_version != DocumentIngester.kb_version:
+            return
+        self.answer_cache.add(q_emb, result, scope)
+    
+    def _embed_question(self, question: str) -> Optional[List[float]]:
+        """Embed a question for the answer cache; None if embedding fails."""
+        try:
+            return self.ingester.embed([question])[0]
+        except Exception as e:
+            print(f"Warning: Could not embed question for answer cache: {e}")
+            return None
+    
+    @staticmethod
+    def _answer_cache_scope(employee_context: Optional[Dict]):
+        """Answers are personalized, so only reuse them for the same employee context."""
+        if not employee_context:
+            return None
+        return (
+            employee_context.get('name'),
+            employee_context.get('role'),
+            employee_context.get('department')
+        )
+    
+    def _build_answer_messages(self, question: str, employee_context: Optional[Dict],
+                               context: str) -> List:
+        """Build the LLM messages for a Q&A request."""
         # Build prompt
         employee_info = ""
         if employee_context:
-            employee_info = f"\nEmployee Information:\n- Name: {employee_context.get('name', 'N/A')}\n- Role: {employee_context.get('role', 'N/A')}\n- Department: {employee_context.get('department', 'N/A')}\n"
-        
-        system_prompt = """You are an AI Employee Onboarding Assistant. Your role is to help new employees understand company policies, procedures, and their onboarding process. Always provide accurate, helpful answers based on the provided context. If the context doesn't contain enough information, say so clearly."""
-        
-        user_prompt = f"""Based on the following company documents and information, please answer this question: {question}
-
-{employee_info}
-
-Relevant Context from Company Documents:
-{context if context else "No relevant context found in the knowledge base."}
-
-Please provide a clear, comprehensive answer. At the end, list the sources you used (document names and page numbers)."""
-        
-        # Get response from LLM
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_prompt)
-        ]
-        
-        # Retry logic for rate limits and API errors
-        max_retries = 3
-        retry_delay = 2  # Start with 2 seconds
-        
-        for attempt in range(max_retries):
-            try:
-                response = self.llm.invoke(messages)
-                answer = response.content if hasattr(response, 'content') else str(response)
-                break  # Success, exit retry loop
-            except AttributeError:
-                # Fallback for older API
-                try:
-                    response = self.llm(messages)
-                    answer = response.content if hasattr(response, 'content') else str(response)
-                    break  # Success, exit retry loop
-                except Exception as e:
-                    error_str = str(e).lower()
-                    error_type = type(e).__name__.lower()
-                    # Check if it's a rate limit error
-                    if 'rate limit' in error_str or 'ratelimit' in error_str or 'ratelimiterror' in error_type:
-                        if attempt < max_retries - 1:
-                            wait_time = retry_delay * (2 ** attempt)
-                            time.sleep(wait_time)
-                            continue
-                        else:
-                            raise Exception(
-                                "OpenAI API rate limit exceeded. Please wait a moment and try again. "
-                                "If this persists, you may need to upgrade your OpenAI plan or reduce request frequency."
-                            ) from e
-                    elif attempt == max_retries - 1:
-                        raise
-                    else:
-                        time.sleep(retry_delay * (2 ** attempt))
-            except (RateLimitError, APIError, APIConnectionError) as e:
-                # Handle rate limit errors with exponential backoff
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    # Last attempt failed, raise with user-friendly message
-                    raise Exception(
-                        "OpenAI API rate limit exceeded. Please wait a moment and try again. "
-                        "If this persists, you may need to upgrade your OpenAI plan or reduce request frequency."
-                    ) from e
-            except Exception as e:
-                # For other errors, check if it's a rate limit error by string matching
-                error_str = str(e).lower()
-                error_type = type(e).__name__.lower()
-                if 'rate limit' in error_str or 'ratelimit' in error_str or 'ratelimiterror' in error_type:
-                    if attempt < max_retries - 1:
-                        wait_time = retry_delay * (2 ** attempt)
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        raise Exception(
-                            "OpenAI API rate limit exceeded. Please wait a moment and try again. "
-                            "If this persists, you may need to upgrade your OpenAI plan or reduce request frequency."
-                        ) from e
-                else:
-                    # For other errors, raise immediately
-                    raise
+            employee_info = EMPLOYEE_INFO_TEMPLATE.substitute(
+                name=employee_context.get('name', 'N/A'),
+                role=employee_context.get('role', 'N/A'),
+                department=employee_context.get('department', 'N/A')
+            )
         
-        # Extract citations
-        citations = []
-        for result in kb_results:
-            citations.append({
-                'source': result['metadata'].get('source', 'Unknown'),
-                'page': result['metadata'].get('page', 'N/A'),
-                'relevance_score': 1 - result['distance'] if result['distance'] else None
-            })
+        user_prompt = ANSWER_USER_TEMPLATE.substitute(
+            question=question,
+            employee_info=employee_info,
+            context=context or "No relevant context found in the knowledge base."
+        )
         
+        return self._chat_messages(ANSWER_SYSTEM_PROMPT, user_prompt)
+    
+    def _build_answer_result(self, answer: str, citations: List[Dict]) -> Dict:
+        """Attach citations to an LLM answer."""
         return {
             'answer': answer,
             'citations': citations,
-            'context_used': len(kb_results) > 0
+            'context_used': len(citations) > 0
         }
     
-    def generate_onboarding_plan(self, employee_id: str, employee_data: Dict) -> Dict:
-        """Generate a personalized onboarding plan for an employee."""
-        # Query knowledge base for role-specific and general onboarding info
-        role_query = f"onboarding process for {employee_data.get('role', 'employee')} in {employee_data.get('department', 'company')}"
-        kb_results = self.ingester.query_knowledge_base(role_query, n_results=10)
-        
-        # Also get general onboarding info
-        general_results = self.ingester.query_knowledge_base("employee onboarding checklist tasks", n_results=5)
-        all_results = kb_results + general_results
-        
-        # Build context
-        context = "\n\n".join([
-            f"[Source: {r['metadata'].get('source', 'Unknown')}, Page {r['metadata'].get('page', 'N/A')}]\n{r['text']}"
-            for r in all_results
-        ])
+    def generate_onboarding_plan(self, employee_id: str, employee_data: Dict,
+                                 use_cache: bool = True) -> Dict:
+        """Generate a personalized onboarding plan for an employee.
         
+        Pass use_cache=False to always call the LLM (e.g. an explicit regenerate).
+        """
+        # Query knowledge base for role-specific and general onboarding info
+        # (both queries are embedded and searched in a single batched call)
+        kb_results, general_results = self.ingester.query_knowledge_base_batch(
+            [self._role_query(employee_data), GENERAL_ONBOARDING_QUERY],
+            [10, 5]
+        )
+        
+        # Reuse the plan generated for the same role/department if the
+        # knowledge base context it was based on hasn't changed
+        key, digest, template_text = self._lookup_plan_template(
+            employee_data, kb_results, general_results, use_cache
+        )
+        if template_text is None:
+            messages = self._build_plan_messages(employee_data, chain(kb_results, general_results))
+            template_text = self._invoke_llm(messages)
+            self._store_plan_template(key, digest, template_text)
+        
+        return self._finalize_plan(employee_id, self._personalize_plan(template_text, employee_data))
+    
+    async def agenerate_onboarding_plan(self, employee_id: str, employee_data: Dict,
+                                        seed_progress: bool = True,
+                                        use_cache: bool = True) -> Dict:
+        """Async variant of generate_onboarding_plan.
+        
+        The role-specific and general knowledge base queries go out as one
+        batched call in a worker thread, and the LLM call is awaited. With
+        seed_progress=False the checklist tasks are not added to progress
+        tracking (agenerate_plans_bulk inserts them for all plans at once).
+        """
+        kb_results, general_results = await self.ingester.aquery_knowledge_base_batch(
+            [self._role_query(employee_data), GENERAL_ONBOARDING_QUERY],
+            [10, 5]
+        )
+        
+        key, digest, template_text = self._lookup_plan_template(
+            employee_data, kb_results, general_results, use_cache
+        )
+        if template_text is None:
+            messages = self._build_plan_messages(employee_data, chain(kb_results, general_results))
+            template_text = await self._ainvoke_llm(messages)
+            self._store_plan_template(key, digest, template_text)
+        
+        plan_text = self._personalize_plan(template_text, employee_data)
+        return await asyncio.to_thread(self._finalize_plan, employee_id, plan_text, seed_progress)
+    
+    async def agenerate_plans_bulk(self, employees: List[Tuple[str, Dict]],
+                                   max_concurrency: int = 8) -> List[Dict]:
+        """Generate plans for several new hires concurrently.
+        
+        At most max_concurrency plans are in flight at once. Results come back
+        in input order; a plan that failed is reported as {'employee_id', 'error'}
+        instead of raising. Checklist tasks of all successful plans are added to
+        progress tracking in one transaction at the end.
+        """
+        sem = asyncio.Semaphore(max_concurrency)
+        
+        async def _generate(employee_id: str, employee_data: Dict) -> Dict:
+            async with sem:
+                return await self.agenerate_onboarding_plan(
+                    employee_id, employee_data, seed_progress=False
+                )
+        
+        outcomes = await asyncio.gather(
+            *(_generate(employee_id, employee_data) for employee_id, employee_data in employees),
+            return_exceptions=True
+        )
+        
+        results = []
+        tasks_by_employee = []
+        for (employee_id, _), outcome in zip(employees, outcomes):
+            if isinstance(outcome, BaseException):
+                results.append({'employee_id': employee_id, 'error': str(outcome)})
+            else:
+                results.append(outcome)
+                tasks_by_employee.append((employee_id, outcome['checklist_items']))
+        
+        if tasks_by_employee:
+            await asyncio.to_thread(self.db.add_progress_tasks_for_employees, tasks_by_employee)
+        return results
+    
+    async def astream_onboarding_plan(self, employee_id: str, employee_data: Dict,
+                                      use_cache: bool = True) -> AsyncIterator[Dict]:
+        """Stream plan generation, yielding partial results as the LLM writes.
+        
+        Each completed line re-parses the text received so far and yields
+        {'plan_data': ..., 'done': False}. Once generation ends the plan is
+        saved like in generate_onboarding_plan and that result is yielded
+        with 'done': True.
+        """
+        kb_results, general_results = await self.ingester.aquery_knowledge_base_batch(
+            [self._role_query(employee_data), GENERAL_ONBOARDING_QUERY],
+            [10, 5]
+        )
+        
+        key, digest, template_text = self._lookup_plan_template(
+            employee_data, kb_results, general_results, use_cache
+        )
+        if template_text is None:
+            messages = self._build_plan_messages(employee_data, chain(kb_results, general_results))
+            chunks = []
+            async for chunk in self._astream_llm(messages):
+                chunks.append(chunk)
+                if '\n' in chunk:
+                    partial = ''.join(chunks)
+                    partial = self._personalize_plan(partial[:partial.rfind('\n')], employee_data)
+                    yield {'plan_data': self._parse_plan(partial), 'done': False}
+            template_text = ''.join(chunks)
+            self._store_plan_template(key, digest, template_text)
+        
+        plan_text = self._personalize_plan(template_text, employee_data)
+        result = await asyncio.to_thread(self._finalize_plan, employee_id, plan_text)
+        result['done'] = True
+        yield result
+    
+    @staticmethod
+    def _plan_template_key(employee_data: Dict) -> Tuple[str, str]:
+        """Plans are shared between hires with the same role and department."""
+        return (employee_data.get('role') or '', employee_data.get('department') or '')
+    
+    @staticmethod
+    def _kb_digest(results: Iterable[Dict]) -> str:
+        """Fingerprint the retrieved context so cached plans expire when documents change."""
+        digest = hashlib.sha1()
+        for r in results:
+            digest.update(r['text'].encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+    
+    def _lookup_plan_template(self, employee_data: Dict, kb_results: List[Dict],
+                              general_results: List[Dict],
+                              use_cache: bool = True) -> Tuple[Tuple[str, str], str, Optional[str]]:
+        """Return (cache key, KB digest, cached plan text or None) for a plan request.
+        
+        With use_cache=False the role/department entry is evicted so the
+        caller generates (and re-caches) a fresh plan.
+        """
+        key = self._plan_template_key(employee_data)
+        digest = self._kb_digest(chain(kb_results, general_results))
+        if not use_cache:
+            self._plan_template_cache.pop(key, None)
+            return key, digest, None
+        return key, digest, self._cached_plan_template(key, digest)
+    
+    def _cached_plan_template(self, key: Tuple[str, str], digest: str) -> Optional[str]:
+        """Return the cached plan text for a role/department, dropping stale entries."""
+        entry = self._plan_template_cache.get(key)
+        if entry is None:
+            return None
+        created_at, cached_digest, plan_text = entry
+        if cached_digest != digest or time.time() - created_at > PLAN_TEMPLATE_TTL:
+            self._plan_template_cache.pop(key, None)
+            return None
+        self._plan_template_cache.move_to_end(key)
+        return plan_text
+    
+    def _store_plan_template(self, key: Tuple[str, str], digest: str, plan_text: str) -> None:
+        """Cache a role/department plan, evicting the least recently used beyond the cap."""
+        self._plan_template_cache[key] = (time.time(), digest, plan_text)
+        self._plan_template_cache.move_to_end(key)
+        while len(self._plan_template_cache) > PLAN_TEMPLATE_CACHE_SIZE:
+            self._plan_template_cache.popitem(last=False)
+    
+    @staticmethod
+    def _personalize_plan(plan_text: str, employee_data: Dict) -> str:
+        """Fill the name and start date placeholders for a specific employee."""
+        return plan_text.replace(
+            NAME_PLACEHOLDER, str(employee_data.get('name') or 'N/A')
+        ).replace(
+            START_DATE_PLACEHOLDER, str(employee_data.get('start_date') or 'N/A')
+        )
+    
+    @staticmethod
+    def _role_query(employee_data: Dict) -> str:
+        """Knowledge base query for role-specific onboarding info."""
+        return f"onboarding process for {employee_data.get('role', 'employee')} in {employee_data.get('department', 'company')}"
+    
+    def _build_plan_messages(self, employee_data: Dict, all_results: Iterable[Dict]) -> List:
+        """Build the LLM messages for plan generation."""
         # Build prompt for plan generation
-        system_prompt = """You are an AI Employee Onboarding Assistant specialized in creating personalized onboarding plans. Create comprehensive, structured onboarding plans that help new employees integrate smoothly into the company."""
-        
-        user_prompt = f"""Create a personalized onboarding plan for a new employee with the following information:
-
-Employee Details:
-- Name: {employee_data.get('name', 'N/A')}
-- Role: {employee_data.get('role', 'N/A')}
-- Department: {employee_data.get('department', 'N/A')}
-- Start Date: {employee_data.get('start_date', 'N/A')}
-
-Relevant Context from Company Documents:
-{context if context else "General onboarding best practices."}
-
-Please create a comprehensive onboarding plan that includes:
-1. Week-by-week breakdown of activities
-2. Specific tasks and milestones
-3. Required training sessions
-4. Key people to meet
-5. Resources and documentation to review
-6. Department-specific requirements
-
-Format the response as a structured plan with clear phases (Week 1, Week 2, etc.) and actionable tasks."""
-        
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_prompt)
-        ]
-        
-        # Retry logic for rate limits and API errors
-        max_retries = 3
-        retry_delay = 2  # Start with 2 seconds
-        
-        for attempt in range(max_retries):
-            try:
-                response = self.llm.invoke(messages)
-                plan_text = response.content if hasattr(response, 'content') else str(response)
-                break  # Success, exit retry loop
-            except AttributeError:
-                # Fallback for older API
-                try:
-                    response = self.llm(messages)
-                    plan_text = response.content if hasattr(response, 'content') else str(response)
-                    break  # Success, exit retry loop
-                except Exception as e:
-                    error_str = str(e).lower()
-                    error_type = type(e).__name__.lower()
-                    # Check if it's a rate limit error
-                    if 'rate limit' in error_str or 'ratelimit' in error_str or 'ratelimiterror' in error_type:
-                        if attempt < max_retries - 1:
-                            wait_time = retry_delay * (2 ** attempt)
-                            time.sleep(wait_time)
-                            continue
-                        else:
-                            raise Exception(
-                                "OpenAI API rate limit exceeded. Please wait a moment and try again. "
-                                "If this persists, you may need to upgrade your OpenAI plan or reduce request frequency."
-                            ) from e
-                    elif attempt == max_retries - 1:
-                        raise
-                    else:
-                        time.sleep(retry_delay * (2 ** attempt))
-            except (RateLimitError, APIError, APIConnectionError) as e:
-                # Handle rate limit errors with exponential backoff
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    # Last attempt failed, raise with user-friendly message
-                    raise Exception(
-                        "OpenAI API rate limit exceeded. Please wait a moment and try again. "
-                        "If this persists, you may need to upgrade your OpenAI plan or reduce request frequency."
-                    ) from e
-            except Exception as e:
-                # For other errors, check if it's a rate limit error by string matching
-                error_str = str(e).lower()
-                error_type = type(e).__name__.lower()
-                if 'rate limit' in error_str or 'ratelimit' in error_str or 'ratelimiterror' in error_type:
-                    if attempt < max_retries - 1:
-                        wait_time = retry_delay * (2 ** attempt)
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        raise Exception(
-                            "OpenAI API rate limit exceeded. Please wait a moment and try again. "
-                            "If this persists, you may need to upgrade your OpenAI plan or reduce request frequency."
-                        ) from e
-                else:
-                    # For other errors, raise immediately
-                    raise
-        
+        user_prompt = PLAN_USER_TEMPLATE.substitute(
+            name=NAME_PLACEHOLDER,
+            role=employee_data.get('role', 'N/A'),
+            department=employee_data.get('department', 'N/A'),
+            start_date=START_DATE_PLACEHOLDER,
+            context=_format_context(all_results) or "General onboarding best practices."
+        )
+        
+        return self._chat_messages(PLAN_SYSTEM_PROMPT, user_prompt)
+    
+    def _finalize_plan(self, employee_id: str, plan_text: str, seed_progress: bool = True) -> Dict:
+        """Parse the generated plan, persist it and seed progress tracking."""
         # Parse plan into structured format
         plan_data = self._parse_plan(plan_text)
         
@@ -355,14 +644,9 @@ Format the response as a structured plan with clear phases (Week 1, Week 2, etc.
         # Save to database
         plan_id = self.db.save_onboarding_plan(employee_id, plan_data, checklist_items)
         
-        # Add tasks to progress tracking
-        for item in checklist_items:
-            self.db.add_progress_task(
-                employee_id=employee_id,
-                task_id=item.get('id', f"task_{len(checklist_items)}"),
-                task_name=item.get('task', ''),
-                status='pending'
-            )
+        # Add tasks to progress tracking (single transaction)
+        if seed_progress:
+            self.db.add_progress_tasks_bulk(employee_id, checklist_items, status='pending')
         
         return {
             'plan_id': plan_id,
@@ -371,37 +655,115 @@ Format the response as a structured plan with clear phases (Week 1, Week 2, etc.
             'full_plan_text': plan_text
         }
     
+    def _chat_messages(self, system_prompt: str, user_prompt: str) -> List:
+        """Build the system/user message pair in the form the chat client consumes.
+        
+        The openai fallback sends plain role/content dicts, so it gets those
+        directly instead of message objects it would only convert back.
+        """
+        if not self._uses_langchain:
+            return [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+        return [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=user_prompt)
+        ]
+    
+    @staticmethod
+    def _is_rate_limit_error(e: Exception) -> bool:
+        """Check if an exception looks like a rate limit error by string matching."""
+        error_str = str(e).lower()
+        error_type = type(e).__name__.lower()
+        return 'rate limit' in error_str or 'ratelimit' in error_str or 'ratelimiterror' in error_type
+    
+    def _invoke_llm(self, messages: List) -> str:
+        """Invoke the LLM with retry logic for rate limits and API errors."""
+        for attempt in range(MAX_RETRIES):
+            try:
+                try:
+                    response = self.llm.invoke(messages)
+                except AttributeError:
+                    # Fallback for older API
+                    response = self.llm(messages)
+                return response.content if hasattr(response, 'content') else str(response)
+            except (RateLimitError, APIError, APIConnectionError) as e:
+                # Handle rate limit errors with exponential backoff
+                if attempt < MAX_RETRIES - 1:
+                    time.sleep(RETRY_DELAY * (2 ** attempt))
+                    continue
+                # Last attempt failed, raise with user-friendly message
+                raise Exception(RATE_LIMIT_MESSAGE) from e
+            except Exception as e:
+                # For other errors, check if it's a rate limit error by string matching
+                if not self._is_rate_limit_error(e):
+                    raise
+                if attempt < MAX_RETRIES - 1:
+                    time.sleep(RETRY_DELAY * (2 ** attempt))
+                    continue
+                raise Exception(RATE_LIMIT_MESSAGE) from e
+    
+    async def _ainvoke_llm(self, messages: List) -> str:
+        """Async counterpart of _invoke_llm; backs off with asyncio.sleep."""
+        for attempt in range(MAX_RETRIES):
+            try:
+                if hasattr(self.llm, 'ainvoke'):
+                    response = await self.llm.ainvoke(messages)
+                else:
+                    # Clients without native async run in a worker thread
+                    response = await asyncio.to_thread(self.llm.invoke, messages)
+                return response.content if hasattr(response, 'content') else str(response)
+            except (RateLimitError, APIError, APIConnectionError) as e:
+                if attempt < MAX_RETRIES - 1:
+                    await asyncio.sleep(RETRY_DELAY * (2 ** attempt))
+                    continue
+                raise Exception(RATE_LIMIT_MESSAGE) from e
+            except Exception as e:
+                if not self._is_rate_limit_error(e):
+                    raise
+                if attempt < MAX_RETRIES - 1:
+                    await asyncio.sleep(RETRY_DELAY * (2 ** attempt))
+                    continue
+                raise Exception(RATE_LIMIT_MESSAGE) from e
+    
+    async def _astream_llm(self, messages: List) -> AsyncIterator[str]:
+        """Yield the LLM response as text chunks.
+        
+        Falls back to a single retried _ainvoke_llm call when the client can't
+        stream or the stream fails before producing any output.
+        """
+        if hasattr(self.llm, 'astream'):
+            started = False
+            try:
+                async for chunk in self.llm.astream(messages):
+                    started = True
+                    yield chunk.content if hasattr(chunk, 'content') else str(chunk)
+                return
+            except Exception as e:
+                if started:
+                    raise
+                print(f"Warning: Streaming failed, retrying without streaming: {e}")
+        yield await self._ainvoke_llm(messages)
+    
     def _parse_plan(self, plan_text: str) -> Dict:
         """Parse plan text into structured format."""
         # Simple parsing - can be enhanced with more sophisticated parsing
         plan_data = {
-            'overview': plan_text[:500] if len(plan_text) > 500 else plan_text,
+            'overview': plan_text[:500],
             'phases': [],
             'timeline': 'custom'
         }
         
-        # Try to extract phases/weeks
-        lines = plan_text.split('\n')
-        current_phase = None
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Check if it's a phase header (Week 1, Phase 1, etc.)
-            if any(keyword in line.lower() for keyword in ['week', 'phase', 'day', 'month']):
-                if current_phase:
-                    plan_data['phases'].append(current_phase)
-                current_phase = {
-                    'title': line,
-                    'tasks': []
-                }
-            elif current_phase and (line.startswith('-') or line.startswith('•') or line[0].isdigit()):
-                current_phase['tasks'].append(line.lstrip('- •0123456789. '))
-        
-        if current_phase:
-            plan_data['phases'].append(current_phase)
+        # Phase headers (Week 1, Phase 1, etc.) split the text into segments;
+        # tasks are the bullet/numbered lines inside each segment.
+        headers = list(_PHASE_RE.finditer(plan_text))
+        for idx, header in enumerate(headers):
+            end = headers[idx + 1].start() if idx + 1 < len(headers) else len(plan_text)
+            plan_data['phases'].append({
+                'title': header.group(0).strip(),
+                'tasks': [m.group(1) for m in _TASK_RE.finditer(plan_text, header.end(), end)]
+            })
         
         return plan_data
     
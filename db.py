@@ -5,89 +5,176 @@ Uses SQLite for simplicity and portability.
 
 import sqlite3
 import json
-import os
-from datetime import datetime
-from typing import List, Dict, Optional, Any
+import re
+import threading
+from typing import List, Dict, Optional, Any, Tuple
 from pathlib import Path
 
+# Plan and checklist JSON: use orjson (C, several times faster) when installed,
+# otherwise the standard library. Both read what the other wrote.
+try:
+    import orjson
+    
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+    
+    _json_loads = orjson.loads
+except ImportError:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+
+# SQLite reports writes to a read-only file as "attempt to write a readonly database"
+_READONLY_RE = re.compile(r"read[-_]?only", re.I)
+
+# Task ids are positional (task_1..N), so a regenerated plan reuses them: keep the
+# recorded status, completion time and notes only when the task itself is unchanged
+_PROGRESS_ON_CONFLICT = """
+    ON CONFLICT(employee_id, task_id) DO UPDATE SET
+        status = CASE WHEN task_name = excluded.task_name THEN status ELSE excluded.status END,
+        completed_at = CASE WHEN task_name = excluded.task_name THEN completed_at END,
+        notes = CASE WHEN task_name = excluded.task_name THEN notes END,
+        task_name = excluded.task_name
+"""
+
+# Bump when init_db() gains new tables, indexes or migrations
+SCHEMA_VERSION = 3
+
+# INSERT ... RETURNING needs SQLite 3.35+; older libraries fall back to lastrowid
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
 
 class Database:
     """Database manager for employee onboarding system."""
     
     def __init__(self, db_path: str = "onboarding.db"):
         """Initialize database connection and create tables if needed."""
-        # Try to use the provided path first
-        original_path = Path(db_path)
-        
-        # Check if the original path is writable
-        if original_path.exists():
-            # File exists, check if it's writable
-            if not os.access(original_path, os.W_OK):
-                # Try alternative locations
-                alt_paths = [
-                    Path.cwd() / "onboarding.db",  # Current directory
-                    Path("/tmp") / "onboarding.db",  # Temp directory (Linux/Mac)
-                    Path.home() / ".onboarding.db",  # Home directory
-                ]
-                for alt_path in alt_paths:
-                    try:
-                        alt_path.parent.mkdir(parents=True, exist_ok=True)
-                        if os.access(alt_path.parent, os.W_OK):
-                            self.db_path = str(alt_path)
-                            break
-                    except (PermissionError, OSError):
-                        continue
-                else:
-                    # If all alternatives fail, use original and let it fail with a clear error
-                    self.db_path = db_path
-            else:
-                self.db_path = db_path
-        else:
-            # File doesn't exist, check if we can create it in the directory
-            try:
-                original_path.parent.mkdir(parents=True, exist_ok=True)
-                if os.access(original_path.parent, os.W_OK):
-                    self.db_path = db_path
-                else:
-                    # Try current directory as fallback
-                    self.db_path = str(Path.cwd() / "onboarding.db")
-            except (PermissionError, OSError):
-                # Fallback to current directory
-                self.db_path = str(Path.cwd() / "onboarding.db")
+        # Try to use the provided path first: a single open() both checks that
+        # it is writable and creates it, instead of stat/access probing
+        self.db_path = db_path
+        if db_path != ":memory:" and not self._touch(db_path):
+            # Try alternative locations
+            alt_paths = [
+                Path.cwd() / "onboarding.db",  # Current directory
+                Path("/tmp") / "onboarding.db",  # Temp directory (Linux/Mac)
+                Path.home() / ".onboarding.db",  # Home directory
+            ]
+            for alt_path in alt_paths:
+                if self._touch(str(alt_path)):
+                    self.db_path = str(alt_path)
+                    break
+            # If all alternatives fail, keep the original and let sqlite raise a clear error
         
-        # Ensure the directory exists
-        db_file = Path(self.db_path)
+        # One connection per thread, reused across calls (see get_connection)
+        self._local = threading.local()
+        self.init_db()
+    
+    @staticmethod
+    def _touch(path: str) -> bool:
+        """Create the file if needed and report whether it can be opened for writing."""
         try:
-            db_file.parent.mkdir(parents=True, exist_ok=True)
-        except (PermissionError, OSError) as e:
-            raise PermissionError(
-                f"Cannot create database directory: {db_file.parent}. "
-                f"Error: {str(e)}. Please check file permissions."
-            )
+            with open(path, 'ab'):
+                pass
+            return True
+        except FileNotFoundError:
+            # Missing parent directory: create it once and retry
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                with open(path, 'ab'):
+                    pass
+                return True
+            except OSError:
+                return False
+        except OSError:
+            return False
+    
+    @staticmethod
+    def _insert_id(conn: sqlite3.Connection, sql: str, params: Tuple) -> int:
+        """Run a single-row INSERT and return the new row id."""
+        if _HAS_RETURNING:
+            # fetchall() steps the statement to completion so the commit isn't blocked
+            ((row_id,),) = conn.execute(sql + " RETURNING id", params).fetchall()
+            return row_id
+        return conn.execute(sql, params).lastrowid
+    
+    def _fetch_dicts(self, sql: str, params: Tuple = ()) -> List[Dict]:
+        """Run a query and return its rows as dicts.
         
-        self.init_db()
+        Uses a plain tuple cursor and zips each row with the column names,
+        rather than building a sqlite3.Row per row and converting that.
+        """
+        cursor = self.get_connection().cursor()
+        cursor.row_factory = None
+        cursor.execute(sql, params)
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
     
     def get_connection(self):
-        """Get database connection with error handling."""
+        """Get this thread's database connection, opening it on first use.
+        
+        Connections are kept per thread and reused rather than opened and
+        closed around every query, so sqlite3's per-connection statement
+        cache skips re-preparing the same SQL. Writes run inside
+        ``with conn:`` so a failed statement rolls back instead of leaving
+        the shared connection in an open transaction.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
         try:
-            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            # timeout is SQLite's busy timeout: wait up to 5s for another writer
+            # (a session, the ingestion worker or the scheduler) instead of failing
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0,
+                                   cached_statements=256)
             conn.row_factory = sqlite3.Row
-            # Enable WAL mode for better concurrency
-            conn.execute("PRAGMA journal_mode=WAL")
+            # Per-connection settings (WAL itself is set once in init_db); with WAL,
+            # NORMAL sync is still crash-safe and avoids an fsync on every commit
+            conn.executescript("""
+                PRAGMA synchronous=NORMAL;
+                PRAGMA temp_store=MEMORY;
+                PRAGMA cache_size=-20000;
+                PRAGMA mmap_size=268435456;
+            """)
+            self._local.conn = conn
             return conn
         except sqlite3.OperationalError as e:
-            if "readonly" in str(e).lower() or "read-only" in str(e).lower():
+            if _READONLY_RE.search(str(e)):
                 raise PermissionError(
                     f"Database is read-only. Cannot write to: {self.db_path}. "
                     "Please check file permissions or use a writable location."
                 ) from e
             raise
     
+    def close(self):
+        """Close the calling thread's connection; the next call opens a new one."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+    
     def init_db(self):
         """Initialize database tables."""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # Enable WAL mode for better concurrency. The journal mode is stored in the
+        # database file, so setting it once here covers every later connection.
+        if self.db_path != ":memory:":
+            try:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.OperationalError as e:
+                if _READONLY_RE.search(str(e)):
+                    raise PermissionError(
+                        f"Database is read-only. Cannot write to: {self.db_path}. "
+                        "Please check file permissions or use a writable location."
+                    ) from e
+                raise
+        
+        # Schema, indexes and migrations below are recorded in user_version once
+        # applied, so reopening an up-to-date database skips all of the DDL
+        if cursor.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        
         # Employees table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS employees (
@@ -144,10 +231,28 @@ class Database:
                 sent_at TIMESTAMP,
                 status TEXT DEFAULT 'pending',
                 channel TEXT DEFAULT 'email',
+                claimed_at TIMESTAMP,
+                claim_token TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_attempt_at TIMESTAMP,
                 FOREIGN KEY (employee_id) REFERENCES employees(employee_id)
             )
         """)
         
+        # Reminder claim columns (schema version 2) for databases created before them
+        reminder_columns = {row[1] for row in cursor.execute("PRAGMA table_info(reminders)")}
+        if 'claim_token' not in reminder_columns:
+            cursor.executescript("""
+                ALTER TABLE reminders ADD COLUMN claimed_at TIMESTAMP;
+                ALTER TABLE reminders ADD COLUMN claim_token TEXT;
+            """)
+        # Failed-send tracking (schema version 3)
+        if 'attempts' not in reminder_columns:
+            cursor.executescript("""
+                ALTER TABLE reminders ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0;
+                ALTER TABLE reminders ADD COLUMN last_attempt_at TIMESTAMP;
+            """)
+        
         # Documents metadata table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS documents (
@@ -161,8 +266,45 @@ class Database:
             )
         """)
         
+        # Indexes for the hot lookups and orderings (employee_id filters, newest-first lists,
+        # the scheduler's pending-reminder scan)
+        cursor.executescript("""
+            CREATE INDEX IF NOT EXISTS ix_progress_emp_created ON progress(employee_id, created_at);
+            CREATE INDEX IF NOT EXISTS ix_plans_emp_created ON onboarding_plans(employee_id, created_at DESC);
+            CREATE INDEX IF NOT EXISTS ix_reminders_status_time ON reminders(status, scheduled_time);
+            CREATE INDEX IF NOT EXISTS ix_employees_created ON employees(created_at DESC);
+            CREATE INDEX IF NOT EXISTS ix_documents_uploaded ON documents(uploaded_at DESC);
+        """)
+        
+        # One progress row per (employee, task). Older databases collected duplicates
+        # because every regenerated plan re-inserted its task ids as new pending rows;
+        # keep a completed row when there is one (so recorded progress survives),
+        # otherwise the newest.
+        if not cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'ux_progress_emp_task'"
+        ).fetchone():
+            cursor.executescript("""
+                DROP INDEX IF EXISTS ix_progress_emp_task;
+                DELETE FROM progress WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (
+                            PARTITION BY employee_id, task_id
+                            ORDER BY status = 'completed' DESC, id DESC
+                        ) AS rn
+                        FROM progress
+                    ) WHERE rn > 1
+                );
+                CREATE UNIQUE INDEX ux_progress_emp_task ON progress(employee_id, task_id);
+            """)
+        
+        # Gather planner statistics the first time; later startups keep the existing ones
+        if not cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+        ).fetchone():
+            cursor.execute("ANALYZE")
+        
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         conn.commit()
-        conn.close()
     
     def add_employee(self, employee_id: str, name: str, email: str, 
                     phone: str = None, role: str = None, 
@@ -170,13 +312,11 @@ class Database:
         """Add a new employee to the database."""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO employees (employee_id, name, email, phone, role, department, start_date)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (employee_id, name, email, phone, role, department, start_date))
-            conn.commit()
-            conn.close()
+            with conn:
+                conn.execute("""
+                    INSERT INTO employees (employee_id, name, email, phone, role, department, start_date)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (employee_id, name, email, phone, role, department, start_date))
             return True
         except sqlite3.IntegrityError:
             return False
@@ -184,155 +324,331 @@ class Database:
     def get_employee(self, employee_id: str) -> Optional[Dict]:
         """Get employee by ID."""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM employees WHERE employee_id = ?", (employee_id,))
-        row = cursor.fetchone()
-        conn.close()
+        row = conn.execute("SELECT * FROM employees WHERE employee_id = ?", (employee_id,)).fetchone()
         return dict(row) if row else None
     
-    def get_all_employees(self) -> List[Dict]:
-        """Get all employees."""
+    def get_employees_by_ids(self, employee_ids) -> List[Dict]:
+        """Get the employees with the given IDs in one query (missing IDs are skipped)."""
+        employee_ids = list(employee_ids)
+        if not employee_ids:
+            return []
+        # Bind the IDs as one JSON array so any number fits in a single parameter
+        return self._fetch_dicts("""
+            SELECT * FROM employees
+            WHERE employee_id IN (SELECT value FROM json_each(?))
+        """, (_json_dumps(employee_ids),))
+    
+    def get_all_employees(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Get all employees, newest first; pass limit/offset for one page."""
+        # LIMIT -1 means no limit in SQLite
+        return self._fetch_dicts("SELECT * FROM employees ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                                 (-1 if limit is None else limit, offset))
+    
+    def get_recent_employees(self, limit: int = 10) -> List[Dict]:
+        """Get the newest employees with only the columns the dashboard shows."""
+        return self._fetch_dicts("""
+            SELECT employee_id, name, email, role, department, start_date
+            FROM employees ORDER BY created_at DESC LIMIT ?
+        """, (limit,))
+    
+    def count_employees(self, status: Optional[str] = None) -> int:
+        """Get the number of employees, optionally only those with the given status."""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM employees ORDER BY created_at DESC")
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+        if status is None:
+            count = conn.execute("SELECT COUNT(*) FROM employees").fetchone()[0]
+        else:
+            count = conn.execute("SELECT COUNT(*) FROM employees WHERE status = ?",
+                                 (status,)).fetchone()[0]
+        return count
     
     def save_onboarding_plan(self, employee_id: str, plan_data: Dict, 
                             checklist_items: List[Dict]) -> int:
         """Save onboarding plan for an employee."""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO onboarding_plans (employee_id, plan_data, checklist_items)
-            VALUES (?, ?, ?)
-        """, (employee_id, json.dumps(plan_data), json.dumps(checklist_items)))
-        plan_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with conn:
+            plan_id = self._insert_id(conn, """
+                INSERT INTO onboarding_plans (employee_id, plan_data, checklist_items)
+                VALUES (?, ?, ?)
+            """, (employee_id, _json_dumps(plan_data), _json_dumps(checklist_items)))
         return plan_id
     
     def get_onboarding_plan(self, employee_id: str) -> Optional[Dict]:
         """Get onboarding plan for an employee."""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
+        row = conn.execute("""
             SELECT * FROM onboarding_plans 
             WHERE employee_id = ? 
             ORDER BY created_at DESC 
             LIMIT 1
-        """, (employee_id,))
-        row = cursor.fetchone()
-        conn.close()
+        """, (employee_id,)).fetchone()
         if row:
             plan = dict(row)
-            plan['plan_data'] = json.loads(plan['plan_data'])
-            plan['checklist_items'] = json.loads(plan['checklist_items'])
+            plan['plan_data'] = _json_loads(plan['plan_data'])
+            plan['checklist_items'] = _json_loads(plan['checklist_items'])
             return plan
         return None
     
+    def get_plan_version(self, employee_id: str) -> Optional[int]:
+        """Get the row id of the employee's latest plan, or None; changes whenever a plan is saved."""
+        conn = self.get_connection()
+        row = conn.execute("""
+            SELECT id FROM onboarding_plans 
+            WHERE employee_id = ? 
+            ORDER BY created_at DESC, id DESC 
+            LIMIT 1
+        """, (employee_id,)).fetchone()
+        return row[0] if row else None
+    
     def update_task_status(self, employee_id: str, task_id: str, 
                           status: str, notes: str = None):
-        """Update task status in progress tracking."""
+        """Update task status in progress tracking, creating the task row if it is missing."""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        completed_at = datetime.now().isoformat() if status == 'completed' else None
-        cursor.execute("""
-            UPDATE progress 
-            SET status = ?, completed_at = ?, notes = ?
-            WHERE employee_id = ? AND task_id = ?
-        """, (status, completed_at, notes, employee_id, task_id))
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute("""
+                INSERT INTO progress (employee_id, task_id, task_name, status, completed_at, notes)
+                VALUES (?, ?, ?, ?, CASE WHEN ? = 'completed' THEN CURRENT_TIMESTAMP END, ?)
+                ON CONFLICT(employee_id, task_id) DO UPDATE SET
+                    status = excluded.status, completed_at = excluded.completed_at,
+                    notes = excluded.notes
+            """, (employee_id, task_id, task_id, status, status, notes))
+    
+    def bulk_update_task_status(self, employee_id: str, updates: Dict[str, str]):
+        """Apply several {task_id: status} changes for one employee in one transaction."""
+        if not updates:
+            return
+        rows = [(status, status, employee_id, task_id) for task_id, status in updates.items()]
+        conn = self.get_connection()
+        with conn:
+            conn.executemany("""
+                UPDATE progress 
+                SET status = ?,
+                    completed_at = CASE WHEN ? = 'completed' THEN CURRENT_TIMESTAMP END
+                WHERE employee_id = ? AND task_id = ?
+            """, rows)
     
     def add_progress_task(self, employee_id: str, task_id: str, 
                          task_name: str, status: str = 'pending'):
         """Add a new task to progress tracking."""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO progress (employee_id, task_id, task_name, status)
-            VALUES (?, ?, ?, ?)
-        """, (employee_id, task_id, task_name, status))
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute("""
+                INSERT INTO progress (employee_id, task_id, task_name, status)
+                VALUES (?, ?, ?, ?)
+            """ + _PROGRESS_ON_CONFLICT, (employee_id, task_id, task_name, status))
+    
+    def add_progress_tasks_bulk(self, employee_id: str, tasks: List[Dict],
+                                status: str = 'pending'):
+        """Add several checklist tasks to progress tracking in one transaction.
+        
+        Each task is a checklist item dict with 'id' and 'task' keys.
+        """
+        self.add_progress_tasks_for_employees([(employee_id, tasks)], status)
+    
+    def add_progress_tasks_for_employees(self, tasks_by_employee: List[Tuple[str, List[Dict]]],
+                                         status: str = 'pending'):
+        """Add checklist tasks for several employees in one transaction."""
+        rows = [
+            (employee_id, task.get('id', f"task_{i}"), task.get('task', ''), status)
+            for employee_id, tasks in tasks_by_employee
+            for i, task in enumerate(tasks, 1)
+        ]
+        if not rows:
+            return
+        conn = self.get_connection()
+        with conn:
+            # Tasks dropped from a regenerated plan are no longer tracked
+            conn.executemany("""
+                DELETE FROM progress
+                WHERE employee_id = ? AND task_id NOT IN (SELECT value FROM json_each(?))
+            """, [(employee_id, _json_dumps([row[1] for row in rows if row[0] == employee_id]))
+                  for employee_id in dict.fromkeys(row[0] for row in rows)])
+            conn.executemany("""
+                INSERT INTO progress (employee_id, task_id, task_name, status)
+                VALUES (?, ?, ?, ?)
+            """ + _PROGRESS_ON_CONFLICT, rows)
     
     def get_progress(self, employee_id: str) -> List[Dict]:
         """Get all progress tasks for an employee."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
+        return self._fetch_dicts("""
             SELECT * FROM progress 
             WHERE employee_id = ? 
             ORDER BY created_at ASC
         """, (employee_id,))
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+    
+    def get_progress_summary(self, employee_id: str) -> List[Tuple[str, str, str]]:
+        """Get (task_id, task_name, status) tuples for an employee's tasks, oldest first.
+        
+        A narrow alternative to get_progress() for callers that only need
+        these fields: no notes/timestamps are read and no dict is built per row.
+        """
+        cursor = self.get_connection().cursor()
+        cursor.row_factory = None  # plain tuples rather than sqlite3.Row
+        return cursor.execute("""
+            SELECT task_id, task_name, status FROM progress 
+            WHERE employee_id = ? 
+            ORDER BY created_at ASC
+        """, (employee_id,)).fetchall()
+    
+    def get_progress_counts(self, employee_id: str) -> Dict[str, int]:
+        """Get the number of an employee's progress tasks per status."""
+        conn = self.get_connection()
+        rows = conn.execute("""
+            SELECT status, COUNT(*) FROM progress 
+            WHERE employee_id = ? 
+            GROUP BY status
+        """, (employee_id,)).fetchall()
+        return {status: count for status, count in rows}
     
     def add_reminder(self, employee_id: str, reminder_type: str, 
                     message: str, scheduled_time: str, channel: str = 'email'):
         """Add a reminder."""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO reminders (employee_id, reminder_type, message, scheduled_time, channel)
-            VALUES (?, ?, ?, ?, ?)
-        """, (employee_id, reminder_type, message, scheduled_time, channel))
-        reminder_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with conn:
+            reminder_id = self._insert_id(conn, """
+                INSERT INTO reminders (employee_id, reminder_type, message, scheduled_time, channel)
+                VALUES (?, ?, ?, ?, ?)
+            """, (employee_id, reminder_type, message, scheduled_time, channel))
         return reminder_id
     
+    def add_reminders(self, reminders: List[Tuple[str, str, str, str, str]]):
+        """Add several (employee_id, reminder_type, message, scheduled_time, channel)
+        reminders in one transaction."""
+        if not reminders:
+            return
+        conn = self.get_connection()
+        with conn:
+            conn.executemany("""
+                INSERT INTO reminders (employee_id, reminder_type, message, scheduled_time, channel)
+                VALUES (?, ?, ?, ?, ?)
+            """, reminders)
+    
+    def get_next_reminder_time(self, after_time: str) -> Optional[str]:
+        """Get the earliest scheduled_time of a pending reminder after after_time, if any."""
+        row = self.get_connection().execute("""
+            SELECT MIN(scheduled_time) FROM reminders 
+            WHERE status = 'pending' AND scheduled_time > ?
+        """, (after_time,)).fetchone()
+        return row[0]
+    
     def get_pending_reminders(self, before_time: str = None) -> List[Dict]:
         """Get pending reminders."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
         if before_time:
-            cursor.execute("""
+            return self._fetch_dicts("""
                 SELECT * FROM reminders 
                 WHERE status = 'pending' AND scheduled_time <= ?
                 ORDER BY scheduled_time ASC
             """, (before_time,))
-        else:
-            cursor.execute("""
-                SELECT * FROM reminders 
-                WHERE status = 'pending'
-                ORDER BY scheduled_time ASC
-            """)
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+        return self._fetch_dicts("""
+            SELECT * FROM reminders 
+            WHERE status = 'pending'
+            ORDER BY scheduled_time ASC
+        """)
+    
+    def claim_pending_reminders(self, before_time: str, claim_token: str, limit: int,
+                                claim_timeout: int = 600, retry_backoff: int = 60) -> List[Dict]:
+        """Atomically claim up to limit due reminders for one sender and return them.
+        
+        Claimed rows are skipped by other claimers, so two overlapping passes
+        (another process, a manual trigger) never send the same reminder.
+        A claim older than claim_timeout seconds is treated as abandoned
+        (the claimer crashed) and can be taken again.
+        
+        Reminders that failed before wait attempts * retry_backoff seconds
+        after their last attempt and are claimed after never-tried ones, so
+        reminders that keep failing cannot crowd newer ones out of the batch.
+        """
+        sql = """
+            UPDATE reminders SET claimed_at = CURRENT_TIMESTAMP, claim_token = ?
+            WHERE id IN (
+                SELECT id FROM reminders
+                WHERE status = 'pending' AND scheduled_time <= ?
+                  AND (claimed_at IS NULL OR claimed_at < datetime('now', ?))
+                  AND (last_attempt_at IS NULL
+                       OR last_attempt_at <= datetime('now', printf('-%d seconds', attempts * ?)))
+                ORDER BY attempts ASC, scheduled_time ASC
+                LIMIT ?
+            )
+        """
+        params = (claim_token, before_time, f"-{claim_timeout} seconds", retry_backoff, limit)
+        columns = ('id', 'employee_id', 'reminder_type', 'message', 'channel')
+        conn = self.get_connection()
+        with conn:
+            if _HAS_RETURNING:
+                rows = conn.execute(sql + " RETURNING " + ", ".join(columns), params).fetchall()
+            else:
+                conn.execute(sql, params)
+                rows = conn.execute(
+                    f"SELECT {', '.join(columns)} FROM reminders WHERE claim_token = ?",
+                    (claim_token,)
+                ).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def release_reminders(self, reminder_ids: List[int], claim_token: str,
+                          max_attempts: int = 5):
+        """Record a failed attempt on reminders this claimer did not send and drop its claim.
+        
+        They are retried later with backoff; a reminder that has failed
+        max_attempts times is marked 'failed' and no longer retried.
+        """
+        if not reminder_ids:
+            return
+        conn = self.get_connection()
+        with conn:
+            conn.executemany("""
+                UPDATE reminders
+                SET claimed_at = NULL, claim_token = NULL,
+                    attempts = attempts + 1, last_attempt_at = CURRENT_TIMESTAMP,
+                    status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE status END
+                WHERE id = ? AND claim_token = ?
+            """, [(max_attempts, reminder_id, claim_token) for reminder_id in reminder_ids])
     
     def mark_reminder_sent(self, reminder_id: int):
         """Mark reminder as sent."""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE reminders 
-            SET status = 'sent', sent_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (reminder_id,))
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute("""
+                UPDATE reminders 
+                SET status = 'sent', sent_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (reminder_id,))
+    
+    def mark_reminders_sent(self, reminder_ids: List[int], claim_token: Optional[str] = None):
+        """Mark several reminders as sent in one transaction.
+        
+        With claim_token, only reminders still claimed with that token are updated.
+        """
+        if not reminder_ids:
+            return
+        conn = self.get_connection()
+        with conn:
+            if claim_token is None:
+                conn.executemany("""
+                    UPDATE reminders 
+                    SET status = 'sent', sent_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, [(reminder_id,) for reminder_id in reminder_ids])
+            else:
+                conn.executemany("""
+                    UPDATE reminders 
+                    SET status = 'sent', sent_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND claim_token = ?
+                """, [(reminder_id, claim_token) for reminder_id in reminder_ids])
     
     def add_document(self, filename: str, file_path: str, 
-                    file_type: str = 'pdf') -> int:
-        """Add document metadata."""
+                    file_type: Optional[str] = None) -> int:
+        """Add document metadata; file_type defaults to the lowercased extension."""
+        if file_type is None:
+            file_type = Path(filename).suffix.lstrip('.').lower() or 'pdf'
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO documents (filename, file_path, file_type)
-                VALUES (?, ?, ?)
-            """, (filename, file_path, file_type))
-            doc_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
+            with conn:
+                doc_id = self._insert_id(conn, """
+                    INSERT INTO documents (filename, file_path, file_type)
+                    VALUES (?, ?, ?)
+                """, (filename, file_path, file_type))
             return doc_id
         except (sqlite3.OperationalError, PermissionError) as e:
-            if "readonly" in str(e).lower() or "read-only" in str(e).lower():
+            if _READONLY_RE.search(str(e)):
                 raise PermissionError(
                     "Database is read-only. Cannot add document. "
                     "Please check file permissions or contact the administrator."
@@ -343,29 +659,69 @@ class Database:
         """Update document processing status."""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            processed_at = datetime.now().isoformat() if status == 'processed' else None
-            cursor.execute("""
-                UPDATE documents 
-                SET status = ?, processed_at = ?
-                WHERE id = ?
-            """, (status, processed_at, doc_id))
-            conn.commit()
-            conn.close()
+            with conn:
+                conn.execute("""
+                    UPDATE documents 
+                    SET status = ?,
+                        processed_at = CASE WHEN ? = 'processed' THEN CURRENT_TIMESTAMP END
+                    WHERE id = ?
+                """, (status, status, doc_id))
         except (sqlite3.OperationalError, PermissionError) as e:
-            if "readonly" in str(e).lower() or "read-only" in str(e).lower():
+            if _READONLY_RE.search(str(e)):
                 raise PermissionError(
                     "Database is read-only. Cannot update document status. "
                     "Please check file permissions or contact the administrator."
                 ) from e
             raise
     
-    def get_documents(self) -> List[Dict]:
-        """Get all documents."""
+    def get_documents(self, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Get all documents, newest first; pass limit/offset for one page."""
+        return self._fetch_dicts("SELECT * FROM documents ORDER BY uploaded_at DESC LIMIT ? OFFSET ?",
+                                 (-1 if limit is None else limit, offset))
+    
+    def get_recent_documents(self, limit: int = 10) -> List[Dict]:
+        """Get the newest documents with only the columns the dashboard shows."""
+        return self._fetch_dicts("""
+            SELECT filename, file_type, status, uploaded_at
+            FROM documents ORDER BY uploaded_at DESC LIMIT ?
+        """, (limit,))
+    
+    def get_processed_document_sources(self) -> List[str]:
+        """Get the distinct filenames of processed documents, i.e. the knowledge base sources."""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM documents ORDER BY uploaded_at DESC")
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+        rows = conn.execute(
+            "SELECT DISTINCT filename FROM documents WHERE status = 'processed'"
+        ).fetchall()
+        return [row[0] for row in rows]
+    
+    def delete_documents_by_filename(self, filename: str) -> int:
+        """Delete the metadata rows of a document; returns the number of rows removed."""
+        conn = self.get_connection()
+        with conn:
+            return conn.execute("DELETE FROM documents WHERE filename = ?", (filename,)).rowcount
+    
+    def count_documents(self, status: Optional[str] = None) -> int:
+        """Get the number of documents, optionally only those with the given status."""
+        conn = self.get_connection()
+        if status is None:
+            count = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        else:
+            count = conn.execute("SELECT COUNT(*) FROM documents WHERE status = ?",
+                                 (status,)).fetchone()[0]
+        return count
+
+
+_instances: Dict[str, Database] = {}
+_instances_lock = threading.Lock()
+
+
+def get_db(db_path: str = "onboarding.db") -> Database:
+    """Return the process-wide Database for db_path, creating it on first use."""
+    db = _instances.get(db_path)
+    if db is None:
+        with _instances_lock:
+            db = _instances.get(db_path)
+            if db is None:
+                db = _instances[db_path] = Database(db_path)
+    return db
 
@@ -1,13 +1,28 @@
 ﻿import os
+from functools import cache
 from pathlib import Path
+
+
+@cache
+def _loaded():
+    """Parse .env once per process; dotenv_values leaves os.environ untouched."""
+    try:
+        from dotenv import dotenv_values
+        return dotenv_values(".env")
+    except Exception as e:
+        print("dotenv error:", e)
+        return {}
+
+
 print("cwd:", Path.cwd())
 print(".env_exists:", Path(".env").exists())
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-    v = os.getenv("OPENAI_API_KEY")
-    preview = (v[:8] + "...") if v else "<empty>"
-    print("OPENAI loaded:", bool(v))
-    print("OPENAI preview:", preview)
-except Exception as e:
-    print("dotenv error:", e)
+# A key exported by the shell/orchestrator wins anyway; only parse .env when it's missing
+v = os.getenv("OPENAI_API_KEY")
+source = "environment"
+if not v:
+    v = _loaded().get("OPENAI_API_KEY")
+    source = ".env"
+preview = (v[:8] + "...") if v else "<empty>"
+print("OPENAI loaded:", bool(v))
+print("OPENAI source:", source if v else "<none>")
+print("OPENAI preview:", preview)
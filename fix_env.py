@@ -1,26 +1,31 @@
 ﻿from pathlib import Path
+import re
+# a line that starts a new variable or a comment; anything else continues the key
+_NEW_VAR = re.compile(rb'(?:#|[A-Za-z_][A-Za-z0-9_]*=)')
+_KEY_PREFIX = b'OPENAI_API_KEY='
 p = Path('.env')
 if not p.exists():
     print('.env not found')
     raise SystemExit(1)
-lines = p.read_text(encoding='utf-8').splitlines()
+# work on bytes: .env is ASCII in practice, so skip the decode/encode round trip
+original = p.read_bytes()
+lines = iter(original.splitlines())
 out = []
-i = 0
-while i < len(lines):
-    line = lines[i]
-    if line.startswith('OPENAI_API_KEY='):
-        val = line.split('=',1)[1]
-        j = i + 1
+line = next(lines, None)
+while line is not None:
+    if line.startswith(_KEY_PREFIX):
+        # collect the pieces and join once, rather than growing a string per line
+        pieces = [line[len(_KEY_PREFIX):]]
+        line = next(lines, None)
         # join subsequent lines that don't look like new variables or comments
-        while j < len(lines) and not (lines[j].startswith('#') or '=' in lines[j]):
-            val += lines[j].strip()
-            j += 1
-        out.append('OPENAI_API_KEY=' + val)
-        i = j
+        while line is not None and not _NEW_VAR.match(line):
+            pieces.append(line.strip())
+            line = next(lines, None)
+        out.append(_KEY_PREFIX + b''.join(pieces))
     else:
         out.append(line)
-        i += 1
-# backup and write
-p.with_suffix('.env.bak').write_text('\n'.join(out) + '\n', encoding='utf-8')
-p.write_text('\n'.join(out) + '\n', encoding='utf-8')
+        line = next(lines, None)
+# backup the original and write the fixed file
+p.with_name('.env.bak').write_bytes(original)
+p.write_bytes(b'\n'.join(out) + b'\n')
 print('Fixed .env and created .env.bak')
@@ -2,176 +2,324 @@
 Document ingestion module for processing PDFs and building knowledge base with ChromaDB.
 """
 
+import asyncio
 import os
+import re
+import threading
 import PyPDF2
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 import chromadb
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
-import hashlib
-from db import Database
+from db import get_db
+
+# PDFium (via pypdfium2) extracts text in native code, many times faster than
+# PyPDF2's pure-Python parser; PyPDF2 is the fallback when it isn't installed.
+# PDFium is not thread-safe, so documents are only ever read from one thread.
+try:
+    import pypdfium2 as pdfium
+    _PDF_ERRORS = (PyPDF2.errors.PdfReadError, pdfium.PdfiumError)
+except ImportError:
+    pdfium = None
+    _PDF_ERRORS = (PyPDF2.errors.PdfReadError,)
+
+# Read-only storage errors, from SQLite ("readonly database") or Chroma (code 1032)
+_READONLY_RE = re.compile(r"read[-_]?only|1032", re.I)
+
+# Maximum number of query-text embeddings kept in memory per ingester
+EMBEDDING_CACHE_SIZE = 256
+
+# Texts per ONNX inference call when embedding (Chroma's own default is 32)
+EMBEDDING_BATCH_SIZE = 128
+
+
+def _onnx_providers() -> Optional[List[str]]:
+    """Pick ONNX Runtime providers: the GPU when one is available, else the CPU."""
+    try:
+        import onnxruntime
+    except ImportError:
+        return None
+    available = onnxruntime.get_available_providers()
+    return [p for p in ("CUDAExecutionProvider", "CPUExecutionProvider") if p in available] or None
+
+
+class FastEmbeddingFunction(embedding_functions.ONNXMiniLM_L6_V2):
+    """The MiniLM-L6-v2 model behind Chroma's default embedding function, tuned for bulk adds.
+    
+    Keeps one ONNX session for the life of the object, embeds in batches of
+    batch_size and runs on CUDA when ONNX Runtime has that provider.
+    """
+    
+    def __init__(self, batch_size: int = EMBEDDING_BATCH_SIZE):
+        super().__init__(preferred_providers=_onnx_providers())
+        self.batch_size = batch_size
+    
+    def _forward(self, documents: List[str], batch_size: Optional[int] = None):
+        return super()._forward(documents, batch_size or self.batch_size)
+    
+    @staticmethod
+    def name() -> str:
+        # Same model as Chroma's default function, so report its name: collections
+        # persist this name and refuse to open with a differently named function
+        return "default"
+
+
+def _prefetch(pdf_path: str):
+    """Ask the kernel to start reading the whole file into the page cache.
+    
+    Both parsers seek around the file; with the data already being read ahead
+    they hit cached pages instead of faulting on each jump. No-op where
+    posix_fadvise is unavailable; open errors are left for the real open.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(pdf_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _open_pdf(pdf_path: str):
+    """Open a PDF for text extraction with PDFium when available, else PyPDF2."""
+    _prefetch(pdf_path)
+    if pdfium is not None:
+        return pdfium.PdfDocument(pdf_path)
+    return PyPDF2.PdfReader(pdf_path)
+
+
+def _close_pdf(pdf_doc):
+    """Release a document returned by _open_pdf."""
+    if pdfium is not None:
+        pdf_doc.close()
+
+
+def _page_count(pdf_doc) -> int:
+    return len(pdf_doc) if pdfium is not None else len(pdf_doc.pages)
+
+
+def _page_text(pdf_doc, page_num: int) -> str:
+    """Return the text of one page (0-based)."""
+    if pdfium is None:
+        return pdf_doc.pages[page_num].extract_text()
+    page = pdf_doc[page_num]
+    textpage = page.get_textpage()
+    try:
+        return textpage.get_text_range().replace('\r\n', '\n')
+    finally:
+        textpage.close()
+        page.close()
+
+
+_NO_TEXT_ERROR = ("No extractable text found in PDF. This might be a scanned document (image-based PDF). "
+                  "Please use OCR to extract text first.")
+_PASSWORD_ERROR = "PDF file is password-protected. Please remove the password and try again."
+
+
+class PDFExtractionError(Exception):
+    """A PDF could not be read; the message is suitable for showing to the user."""
+
+
+def _iter_pages(pdf_doc, page_indices, source: str) -> Iterator[Dict]:
+    """Yield the text of the given pages, skipping pages without text."""
+    for page_num in page_indices:
+        try:
+            text = _page_text(pdf_doc, page_num)
+        except Exception as page_error:
+            # Continue with other pages if one page fails
+            print(f"Warning: Could not extract text from page {page_num + 1}: {page_error}")
+            continue
+        if text.strip():
+            yield {
+                'text': text,
+                'page': page_num + 1,
+                'source': source
+            }
+
+
+def _extract_page_range(pdf_path: str, page_indices) -> List[Dict]:
+    """Worker entry point: open the PDF in this process and extract the given pages."""
+    pdf_doc = _open_pdf(pdf_path)
+    try:
+        return list(_iter_pages(pdf_doc, page_indices, os.path.basename(pdf_path)))
+    finally:
+        _close_pdf(pdf_doc)
+
+
+def _iter_pdf_pages(pdf_path: str, workers: int = 1) -> Iterator[Dict[str, str]]:
+    """Yield {'text', 'page', 'source'} for each PDF page with text, in page order.
+    
+    Pages are read as they are consumed rather than collected up front.
+    With workers > 1 the pages are split into contiguous ranges that are
+    extracted in separate processes, each opening the file itself.
+    
+    Raises:
+        PDFExtractionError: the file is missing, unreadable, encrypted or empty
+    """
+    try:
+        pdf_doc = _open_pdf(pdf_path)
+        try:
+            # Check if PDF is encrypted (PDFium refuses to open it instead, see below)
+            if getattr(pdf_doc, 'is_encrypted', False):
+                raise PDFExtractionError(_PASSWORD_ERROR)
+            
+            # Check number of pages
+            num_pages = _page_count(pdf_doc)
+            if num_pages == 0:
+                raise PDFExtractionError("PDF file appears to be empty or corrupted.")
+            
+            nproc = min(workers, num_pages)
+            if nproc > 1:
+                shards = [range(k * num_pages // nproc, (k + 1) * num_pages // nproc)
+                          for k in range(nproc)]
+                with ProcessPoolExecutor(max_workers=nproc) as pool:
+                    for shard_pages in pool.map(_extract_page_range, repeat(pdf_path), shards):
+                        yield from shard_pages
+            else:
+                yield from _iter_pages(pdf_doc, range(num_pages), os.path.basename(pdf_path))
+        finally:
+            _close_pdf(pdf_doc)
+    
+    except PDFExtractionError:
+        raise
+    except _PDF_ERRORS as e:
+        if "password" in str(e).lower():
+            raise PDFExtractionError(_PASSWORD_ERROR) from e
+        raise PDFExtractionError(f"PDF file is corrupted or invalid: {str(e)}") from e
+    except FileNotFoundError as e:
+        raise PDFExtractionError(f"PDF file not found: {pdf_path}") from e
+    except PermissionError as e:
+        raise PDFExtractionError(f"Permission denied: Cannot read PDF file {pdf_path}") from e
+    except Exception as e:
+        error_msg = f"Unexpected error extracting text from PDF: {str(e)}"
+        print(error_msg)
+        raise PDFExtractionError(error_msg) from e
+
+
+def _chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """Split text into overlapping chunks."""
+    if len(text) <= chunk_size:
+        return [text]
+    
+    # All chunk starts are known up front, so slice in one comprehension
+    return [text[start:start + chunk_size]
+            for start in range(0, len(text), chunk_size - overlap)]
+
+
+def _read_pdf_chunks(pdf_path: str) -> Tuple[List[Tuple[int, List[str]]], Optional[str]]:
+    """Worker entry point for multi-file ingestion: extract and chunk one PDF.
+    
+    Returns:
+        Tuple of ([(page number, chunk texts), ...], error_message if any)
+    """
+    try:
+        return [(page['page'], _chunk_text(page['text'])) for page in _iter_pdf_pages(pdf_path)], None
+    except PDFExtractionError as e:
+        return [], str(e)
 
 
 class DocumentIngester:
     """Handles PDF document ingestion and ChromaDB knowledge base creation."""
     
+    # The embedding model is loaded once per process and shared by all ingesters
+    _shared_embedding_function = None
+    _shared_embedding_lock = threading.Lock()
+    
+    # Bumped, process-wide, whenever documents are added or deleted, so caches
+    # built from query results (the agent's answer cache) know they are stale
+    kb_version = 0
+    _kb_version_lock = threading.Lock()
+    
     def __init__(self, chroma_db_path: str = "./chroma_db", 
                  collection_name: str = "onboarding_docs"):
         """Initialize ChromaDB client and collection."""
         self.collection_name = collection_name
-        self.db = Database()
-        
-        # Determine writable path for ChromaDB
-        # Try to use the provided path first, but fallback to writable locations
-        original_path = Path(chroma_db_path)
-        
-        # Check if we can write to the original path
-        if original_path.exists():
-            # Directory exists, check if it's writable
-            if not os.access(original_path, os.W_OK):
-                # Try alternative writable locations
-                alt_paths = [
-                    Path.cwd() / "chroma_db",  # Current directory
-                    Path("/tmp") / "chroma_db",  # Temp directory (Linux/Mac)
-                    Path.home() / ".chroma_db",  # Home directory
-                ]
-                for alt_path in alt_paths:
-                    try:
-                        alt_path.mkdir(parents=True, exist_ok=True)
-                        if os.access(alt_path, os.W_OK):
-                            chroma_db_path = str(alt_path)
-                            break
-                    except (PermissionError, OSError):
-                        continue
-        else:
-            # Directory doesn't exist, try to create it
-            try:
-                original_path.mkdir(parents=True, exist_ok=True)
-                if os.access(original_path, os.W_OK):
-                    chroma_db_path = str(original_path)
-                else:
-                    # Fallback to current directory
-                    chroma_db_path = str(Path.cwd() / "chroma_db")
-                    Path(chroma_db_path).mkdir(parents=True, exist_ok=True)
-            except (PermissionError, OSError):
-                # Fallback to current directory
-                chroma_db_path = str(Path.cwd() / "chroma_db")
-                try:
-                    Path(chroma_db_path).mkdir(parents=True, exist_ok=True)
-                except:
-                    # Last resort: use temp directory
-                    import tempfile
-                    chroma_db_path = str(Path(tempfile.gettempdir()) / "chroma_db")
-                    Path(chroma_db_path).mkdir(parents=True, exist_ok=True)
+        self.db = get_db()
         
+        # Open the store directly (PersistentClient creates the directory itself) and
+        # only fall back to a temp directory when that fails for filesystem reasons
         self.chroma_db_path = chroma_db_path
-        
-        # Initialize ChromaDB client with error handling
         try:
             self.client = chromadb.PersistentClient(
                 path=chroma_db_path,
                 settings=Settings(anonymized_telemetry=False)
             )
         except Exception as e:
-            # If the original path fails, try a temp directory
-            if "readonly" in str(e).lower() or "read-only" in str(e).lower():
-                import tempfile
-                temp_path = str(Path(tempfile.gettempdir()) / "chroma_db")
-                Path(temp_path).mkdir(parents=True, exist_ok=True)
-                self.chroma_db_path = temp_path
-                self.client = chromadb.PersistentClient(
-                    path=temp_path,
-                    settings=Settings(anonymized_telemetry=False)
-                )
-            else:
+            # Chroma reports OS failures as InternalError("... (os error N)")
+            if not (isinstance(e, OSError) or _READONLY_RE.search(str(e))
+                    or "os error" in str(e).lower()):
                 raise
+            import tempfile
+            temp_path = str(Path(tempfile.gettempdir()) / "chroma_db")
+            self.chroma_db_path = temp_path
+            self.client = chromadb.PersistentClient(
+                path=temp_path,
+                settings=Settings(anonymized_telemetry=False)
+            )
         
-        # Use default embedding function (sentence-transformers)
-        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        # Same model as Chroma's default embedding function, with batching and GPU support
+        self.embedding_function = self._get_embedding_function()
+        
+        # Query texts that recur (e.g. the general onboarding query) are only embedded once
+        self._embedding_cache: Dict[str, List[float]] = {}
+        self._embedding_cache_lock = threading.Lock()
         
         # Get or create collection
-        try:
-            self.collection = self.client.get_collection(
-                name=collection_name,
-                embedding_function=self.embedding_function
-            )
-        except:
-            self.collection = self.client.create_collection(
-                name=collection_name,
-                embedding_function=self.embedding_function
-            )
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name,
+            embedding_function=self.embedding_function
+        )
+    
+    @classmethod
+    def _bump_kb_version(cls):
+        with cls._kb_version_lock:
+            DocumentIngester.kb_version += 1
+    
+    @classmethod
+    def _get_embedding_function(cls):
+        """Return the process-wide embedding function, creating it on first use."""
+        with cls._shared_embedding_lock:
+            if cls._shared_embedding_function is None:
+                cls._shared_embedding_function = FastEmbeddingFunction()
+            return cls._shared_embedding_function
     
-    def extract_text_from_pdf(self, pdf_path: str) -> Tuple[List[Dict[str, str]], Optional[str]]:
+    def iter_pdf_pages(self, pdf_path: str, workers: int = 1) -> Iterator[Dict[str, str]]:
+        """Yield {'text', 'page', 'source'} for each PDF page with text, in page order.
+        
+        Raises:
+            PDFExtractionError: the file is missing, unreadable, encrypted or empty
+        """
+        return _iter_pdf_pages(pdf_path, workers)
+    
+    def extract_text_from_pdf(self, pdf_path: str,
+                              workers: int = 1) -> Tuple[List[Dict[str, str]], Optional[str]]:
         """Extract text from PDF file, splitting by pages.
         
         Returns:
             Tuple of (chunks list, error_message if any)
         """
-        chunks = []
-        error_msg = None
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                # Check if PDF is encrypted
-                if pdf_reader.is_encrypted:
-                    return [], "PDF file is password-protected. Please remove the password and try again."
-                
-                # Check number of pages
-                num_pages = len(pdf_reader.pages)
-                if num_pages == 0:
-                    return [], "PDF file appears to be empty or corrupted."
-                
-                total_text_length = 0
-                for page_num, page in enumerate(pdf_reader.pages):
-                    try:
-                        text = page.extract_text()
-                        if text.strip():
-                            chunks.append({
-                                'text': text,
-                                'page': page_num + 1,
-                                'source': os.path.basename(pdf_path)
-                            })
-                            total_text_length += len(text.strip())
-                    except Exception as page_error:
-                        # Continue with other pages if one page fails
-                        print(f"Warning: Could not extract text from page {page_num + 1}: {page_error}")
-                
-                # Check if we extracted any text
-                if not chunks:
-                    if num_pages > 0:
-                        return [], "No extractable text found in PDF. This might be a scanned document (image-based PDF). Please use OCR to extract text first."
-                    else:
-                        return [], "Could not extract any text from the PDF file."
-                        
-        except PyPDF2.errors.PdfReadError as e:
-            return [], f"PDF file is corrupted or invalid: {str(e)}"
-        except FileNotFoundError:
-            return [], f"PDF file not found: {pdf_path}"
-        except PermissionError:
-            return [], f"Permission denied: Cannot read PDF file {pdf_path}"
-        except Exception as e:
-            error_msg = f"Unexpected error extracting text from PDF: {str(e)}"
-            print(error_msg)
-            return [], error_msg
+            chunks = list(self.iter_pdf_pages(pdf_path, workers))
+        except PDFExtractionError as e:
+            return [], str(e)
         
+        # Check if we extracted any text
+        if not chunks:
+            return [], _NO_TEXT_ERROR
         return chunks, None
     
     def chunk_text(self, text: str, chunk_size: int = 1000, 
                    overlap: int = 200) -> List[str]:
         """Split text into overlapping chunks."""
-        if len(text) <= chunk_size:
-            return [text]
-        
-        chunks = []
-        start = 0
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
-            chunks.append(chunk)
-            start = end - overlap
-        return chunks
+        return _chunk_text(text, chunk_size, overlap)
     
     def process_pdf(self, pdf_path: str, metadata: Dict = None) -> Tuple[bool, Optional[str]]:
         """Process a PDF file and add to ChromaDB.
@@ -179,156 +327,318 @@ class DocumentIngester:
         Returns:
             Tuple of (success: bool, error_message: str or None)
         """
+        return self.process_pdfs([pdf_path], metadata)[0]
+    
+    def process_pdfs(self, pdf_paths: List[str], metadata: Dict = None,
+                     batch_size: int = 200, workers: int = 1) -> List[Tuple[bool, Optional[str]]]:
+        """Process several PDF files, adding their chunks to ChromaDB in shared batches.
+        
+        Chunks from consecutive files are accumulated and flushed once at least
+        batch_size are pending, so a folder of small PDFs costs a few
+        collection.add calls instead of one per file.
+        
+        With workers > 1, text extraction and chunking run in a process pool
+        while this process registers documents and writes to ChromaDB and
+        SQLite, which stay single-writer.
+        
+        Returns:
+            One (success, error_message) tuple per path, in input order
+        """
+        results: List[Tuple[bool, Optional[str]]] = [(False, None)] * len(pdf_paths)
+        pending: List[Tuple[int, int]] = []  # (index into pdf_paths, doc_id)
+        documents, metadatas, ids = [], [], []
+        
+        def flush():
+            error = self._add_chunks(documents, metadatas, ids,
+                                     [doc_id for _, doc_id in pending], batch_size)
+            for i, _ in pending:
+                results[i] = (error is None, error)
+            pending.clear()
+            documents.clear()
+            metadatas.clear()
+            ids.clear()
+        
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(pdf_paths) > 1 else None
+        try:
+            # Extracted in input order; the pool works ahead while earlier files are written
+            extracted = pool.map(_read_pdf_chunks, pdf_paths) if pool else repeat(None)
+            for i, (pdf_path, read) in enumerate(zip(pdf_paths, extracted)):
+                if read is None:
+                    doc_id, records, error = self._prepare_pdf(pdf_path, metadata)
+                elif read[1]:
+                    doc_id, records, error = None, [], read[1]
+                else:
+                    doc_id, records, error = self._prepare_pdf(pdf_path, metadata, pages=read[0])
+                if error:
+                    results[i] = (False, error)
+                    continue
+                pending.append((i, doc_id))
+                # One sized extend per file instead of growing three lists per chunk
+                chunk_texts, chunk_metadatas, chunk_ids = zip(*records)
+                documents.extend(chunk_texts)
+                metadatas.extend(chunk_metadatas)
+                ids.extend(chunk_ids)
+                if len(ids) >= batch_size:
+                    flush()
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+        
+        if pending:
+            flush()
+        return results
+    
+    def ingest_directory(self, directory: str, metadata: Dict = None, workers: int = 4,
+                         batch_size: int = 250) -> Dict[str, Tuple[bool, Optional[str]]]:
+        """Process every PDF in a directory, extracting with up to workers processes.
+        
+        Returns:
+            Dict of {pdf path: (success, error_message)}
+        """
+        pdf_paths = sorted(str(p) for p in Path(directory).glob("*.pdf"))
+        return dict(zip(pdf_paths, self.process_pdfs(pdf_paths, metadata, batch_size, workers)))
+    
+    def _prepare_pdf(self, pdf_path: str, metadata: Dict = None,
+                     pages=None) -> Tuple[Optional[int], List[Tuple[str, Dict, str]], Optional[str]]:
+        """Extract and chunk one PDF and register it in SQLite.
+        
+        pages may supply already extracted (page number, chunk texts) pairs;
+        by default the file is read here, page by page.
+        
+        Returns:
+            Tuple of (doc_id, [(chunk text, chunk metadata, chunk id), ...], error_message if any)
+        """
+        doc_id = None
         try:
-            # Extract text from PDF
-            pdf_chunks, extract_error = self.extract_text_from_pdf(pdf_path)
-            
-            if extract_error:
-                return False, extract_error
-            
-            if not pdf_chunks:
-                return False, "No text could be extracted from the PDF file. The file might be empty, corrupted, or image-based (scanned document)."
-            
-            # Prepare documents for ChromaDB
-            documents = []
-            metadatas = []
-            ids = []
-            
             filename = os.path.basename(pdf_path)
-            try:
-                doc_id = self.db.add_document(filename, pdf_path, 'pdf')
-            except PermissionError as db_error:
-                return False, f"Database error: {str(db_error)}. The database file may be read-only or you may not have write permissions."
-            
-            for chunk_data in pdf_chunks:
-                # Further chunk if needed
-                text_chunks = self.chunk_text(chunk_data['text'])
+            records = []
+            if pages is None:
+                # Chunk each page as it is read, so only one page's raw text is held at a time
+                pages = ((page['page'], self.chunk_text(page['text']))
+                         for page in self.iter_pdf_pages(pdf_path))
+            for page_num, text_chunks in pages:
+                if doc_id is None:
+                    # Register the document once it is known to have text
+                    try:
+                        doc_id = self.db.add_document(filename, pdf_path)
+                    except PermissionError as db_error:
+                        return None, [], f"Database error: {str(db_error)}. The database file may be read-only or you may not have write permissions."
+                    # Fields shared by every chunk; caller metadata overrides them, as before
+                    base_metadata = {'source': filename, 'doc_id': doc_id, **(metadata or {})}
                 
                 for idx, chunk_text in enumerate(text_chunks):
-                    chunk_id = f"{filename}_{chunk_data['page']}_{idx}"
-                    chunk_hash = hashlib.md5(chunk_id.encode()).hexdigest()
-                    
-                    documents.append(chunk_text)
-                    chunk_metadata = {
-                        'source': chunk_data['source'],
-                        'page': chunk_data['page'],
-                        'chunk_index': idx,
-                        'doc_id': doc_id
-                    }
-                    if metadata:
-                        chunk_metadata.update(metadata)
-                    metadatas.append(chunk_metadata)
-                    ids.append(chunk_hash)
+                    # file/page/index is already unique and stable, so use it as the id as-is
+                    chunk_id = f"{filename}_{page_num}_{idx}"
+                    chunk_metadata = {'page': page_num, 'chunk_index': idx, **base_metadata}
+                    records.append((chunk_text, chunk_metadata, chunk_id))
             
-            # Add to ChromaDB collection with error handling
-            try:
+            if doc_id is None:
+                return None, [], _NO_TEXT_ERROR
+            return doc_id, records, None
+            
+        except PDFExtractionError as e:
+            if doc_id is not None:
+                try:
+                    self.db.update_document_status(doc_id, 'error')
+                except:
+                    pass  # Don't fail if we can't update status
+            return None, [], str(e)
+        except Exception as e:
+            return None, [], self._fail_documents([doc_id] if doc_id is not None else [], e)
+    
+    def _add_chunks(self, documents: List[str], metadatas: List[Dict], ids: List[str],
+                    doc_ids: List[int], batch_size: int) -> Optional[str]:
+        """Add accumulated chunks to ChromaDB and record the documents' status.
+        
+        Returns:
+            None on success, otherwise the error message for every document in doc_ids
+        """
+        # Add to ChromaDB collection with error handling
+        try:
+            # Skip chunks that are already stored (re-ingesting the same file) so
+            # they are not embedded again; ids are deterministic per file/page/chunk
+            seen = set(self.collection.get(ids=ids, include=[])['ids']) if ids else set()
+            keep = [i for i, chunk_id in enumerate(ids)
+                    if chunk_id not in seen and not seen.add(chunk_id)]
+            if len(keep) < len(ids):
+                documents = [documents[i] for i in keep]
+                metadatas = [metadatas[i] for i in keep]
+                ids = [ids[i] for i in keep]
+            
+            # Embed everything in one call (batched by the embedding function) rather
+            # than letting each collection.add embed its own slice
+            embeddings = self.embed(documents) if documents else []
+            for start in range(0, len(ids), batch_size):
+                end = start + batch_size
                 self.collection.add(
-                    documents=documents,
-                    metadatas=metadatas,
-                    ids=ids
+                    documents=documents[start:end],
+                    embeddings=embeddings[start:end],
+                    metadatas=metadatas[start:end],
+                    ids=ids[start:end]
                 )
-            except Exception as chroma_error:
-                error_str = str(chroma_error).lower()
-                if "readonly" in error_str or "read-only" in error_str or "1032" in str(chroma_error):
-                    # Try to update status to error
+        except Exception as chroma_error:
+            if _READONLY_RE.search(str(chroma_error)):
+                # Try to update status to error
+                for doc_id in doc_ids:
                     try:
                         self.db.update_document_status(doc_id, 'error')
                     except:
                         pass
-                    return False, (
-                        f"ChromaDB database is read-only. Cannot write to: {self.chroma_db_path}. "
-                        "This is a common issue on Streamlit Cloud. The app will try to use an alternative location. "
-                        "If the error persists, try redeploying the app."
-                    )
-                else:
-                    raise
-            
-            # Update document status
+                return (
+                    f"ChromaDB database is read-only. Cannot write to: {self.chroma_db_path}. "
+                    "This is a common issue on Streamlit Cloud. The app will try to use an alternative location. "
+                    "If the error persists, try redeploying the app."
+                )
+            return self._fail_documents(doc_ids, chroma_error)
+        
+        if documents:
+            self._bump_kb_version()
+        
+        # Update document status
+        for doc_id in doc_ids:
             try:
                 self.db.update_document_status(doc_id, 'processed')
             except Exception as db_error:
                 # If database update fails, log but don't fail the whole operation
                 print(f"Warning: Could not update document status in SQLite: {db_error}")
-            
-            return True, None
-            
-        except PermissionError as e:
+        return None
+    
+    def _fail_documents(self, doc_ids: List[int], e: Exception) -> str:
+        """Mark documents as failed and return the error message for exception e."""
+        if isinstance(e, PermissionError):
             # Database permission error
             error_msg = f"Database permission error: {str(e)}"
             print(error_msg)
-            if 'doc_id' in locals():
-                try:
-                    self.db.update_document_status(doc_id, 'error')
-                except:
-                    pass  # Don't fail if we can't update status
-            return False, error_msg
-        except Exception as e:
+        else:
             error_msg = f"Error processing PDF: {str(e)}"
             print(error_msg)
             # Check if it's a database readonly error
-            if "readonly" in str(e).lower() or "read-only" in str(e).lower():
+            if _READONLY_RE.search(str(e)):
                 error_msg = f"Database is read-only: {str(e)}. Please check file permissions."
-            if 'doc_id' in locals():
-                try:
-                    self.db.update_document_status(doc_id, 'error')
-                except:
-                    pass  # Don't fail if we can't update status
-            return False, error_msg
+        for doc_id in doc_ids:
+            try:
+                self.db.update_document_status(doc_id, 'error')
+            except:
+                pass  # Don't fail if we can't update status
+        return error_msg
+    
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the same embedding function the collection uses."""
+        return self.embedding_function(list(texts))
+    
+    def embed_cached(self, texts: List[str]) -> List[List[float]]:
+        """Embed query texts, reusing embeddings computed for earlier queries.
+        
+        Only the texts not seen before are sent to the embedding function, in
+        one call. The oldest entries are dropped once EMBEDDING_CACHE_SIZE is
+        reached.
+        """
+        texts = list(texts)
+        with self._embedding_cache_lock:
+            cached = [self._embedding_cache.get(text) for text in texts]
+        missing = list(dict.fromkeys(t for t, emb in zip(texts, cached) if emb is None))
+        if missing:
+            fresh = dict(zip(missing, self.embed(missing)))
+            with self._embedding_cache_lock:
+                self._embedding_cache.update(fresh)
+                while len(self._embedding_cache) > EMBEDDING_CACHE_SIZE:
+                    del self._embedding_cache[next(iter(self._embedding_cache))]
+            cached = [emb if emb is not None else fresh[t] for t, emb in zip(texts, cached)]
+        return cached
+    
+    @staticmethod
+    def _format_results(results: Dict, q_idx: int, n_results: Optional[int] = None) -> List[Dict]:
+        """Turn one query's columns of a ChromaDB query result into per-chunk dicts."""
+        if not results['documents']:
+            return []
+        docs = results['documents'][q_idx][:n_results]
+        metas = results['metadatas'][q_idx]
+        dists = results['distances'][q_idx] if results.get('distances') else repeat(None)
+        return [{'text': text, 'metadata': metadata, 'distance': distance}
+                for text, metadata, distance in zip(docs, metas, dists)]
     
-    def query_knowledge_base(self, query: str, n_results: int = 5) -> List[Dict]:
-        """Query the knowledge base and return relevant chunks with metadata."""
+    def query_knowledge_base(self, query: str, n_results: int = 5,
+                             query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        """Query the knowledge base and return relevant chunks with metadata.
+        
+        If the caller already embedded the query, pass it as query_embedding
+        to skip re-embedding the text; otherwise the embedding cache is used.
+        """
         try:
+            if query_embedding is None:
+                query_embedding = self.embed_cached([query])[0]
             results = self.collection.query(
-                query_texts=[query],
+                query_embeddings=[query_embedding],
                 n_results=n_results
             )
             
             # Format results
-            formatted_results = []
-            if results['documents'] and len(results['documents'][0]) > 0:
-                for i in range(len(results['documents'][0])):
-                    formatted_results.append({
-                        'text': results['documents'][0][i],
-                        'metadata': results['metadatas'][0][i],
-                        'distance': results['distances'][0][i] if 'distances' in results else None
-                    })
-            
-            return formatted_results
+            return self._format_results(results, 0)
         except Exception as e:
             print(f"Error querying knowledge base: {e}")
             return []
     
+    def query_knowledge_base_batch(self, queries: List[str],
+                                   n_results_list: List[int]) -> List[List[Dict]]:
+        """Run several knowledge base queries in a single ChromaDB call.
+        
+        Uncached query texts are embedded in one pass and all queries are
+        searched together with n_results=max(n_results_list); each result list
+        is then trimmed to the size requested for its query.
+        """
+        if not queries:
+            return []
+        try:
+            results = self.collection.query(
+                query_embeddings=self.embed_cached(queries),
+                n_results=max(n_results_list)
+            )
+            
+            return [self._format_results(results, q_idx, n_results)
+                    for q_idx, n_results in enumerate(n_results_list)]
+        except Exception as e:
+            print(f"Error querying knowledge base: {e}")
+            return [[] for _ in queries]
+    
+    async def aquery_knowledge_base(self, query: str, n_results: int = 5,
+                                    query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        """Async wrapper around query_knowledge_base.
+        
+        ChromaDB has no async client for the persistent store, so the query runs
+        in a worker thread and several queries can be awaited concurrently.
+        """
+        return await asyncio.to_thread(self.query_knowledge_base, query, n_results, query_embedding)
+    
+    async def aquery_knowledge_base_batch(self, queries: List[str],
+                                          n_results_list: List[int]) -> List[List[Dict]]:
+        """Async wrapper around query_knowledge_base_batch."""
+        return await asyncio.to_thread(self.query_knowledge_base_batch, queries, n_results_list)
+    
     def get_all_documents(self) -> List[str]:
-        """Get list of all unique document sources in the knowledge base."""
+        """Get list of all unique document sources in the knowledge base.
+        
+        Read from the SQLite documents table, which records every processed
+        file, instead of pulling every chunk's metadata out of ChromaDB.
+        """
         try:
-            # Get all items from collection
-            all_data = self.collection.get()
-            sources = set()
-            if all_data['metadatas']:
-                for metadata in all_data['metadatas']:
-                    if 'source' in metadata:
-                        sources.add(metadata['source'])
-            return list(sources)
+            return self.db.get_processed_document_sources()
         except Exception as e:
             print(f"Error getting documents: {e}")
             return []
     
     def delete_document(self, source_name: str):
-        """Delete all chunks from a specific document."""
+        """Delete all chunks from a specific document, and its SQLite record."""
         try:
-            all_data = self.collection.get()
-            ids_to_delete = []
-            
-            if all_data['ids'] and all_data['metadatas']:
-                for idx, metadata in enumerate(all_data['metadatas']):
-                    if metadata.get('source') == source_name:
-                        ids_to_delete.append(all_data['ids'][idx])
-            
-            if ids_to_delete:
-                self.collection.delete(ids=ids_to_delete)
-                return True
-            return False
+            # Filter in ChromaDB rather than fetching and scanning every chunk;
+            # delete() doesn't report a count, so check for one matching id first
+            where = {'source': source_name}
+            had_chunks = bool(self.collection.get(where=where, include=[], limit=1)['ids'])
+            if had_chunks:
+                self.collection.delete(where=where)
+                self._bump_kb_version()
+            removed_rows = self.db.delete_documents_by_filename(source_name)
+            # Either store holding the document counts as a successful delete
+            return had_chunks or removed_rows > 0
         except Exception as e:
             print(f"Error deleting document: {e}")
             return False
-
@@ -2,17 +2,106 @@
 Scheduler module for sending reminders via email and WhatsApp.
 """
 
+import functools
+import html
 import os
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+from email import policy
+from email.message import EmailMessage
+from email.utils import formataddr
+from string import Template
+from types import SimpleNamespace
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-import schedule
-import time
 import threading
-from db import Database
+import uuid
+from db import get_db
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Messages sent over one SMTP connection before reconnecting (provider rate limits)
+SMTP_MESSAGES_PER_CONNECTION = 100
+
+# Seconds an SMTP connect or command may block before the send fails (and is retried
+# on a later pass) instead of hanging the sender thread
+SMTP_TIMEOUT = 10
+
+# TCP keepalive for SMTP connections held open across a batch: (option, value)
+_KEEPALIVE_OPTIONS = [(getattr(socket, name), value)
+                      for name, value in (('TCP_KEEPIDLE', 30), ('TCP_KEEPINTVL', 10),
+                                          ('TCP_KEEPCNT', 3))
+                      if hasattr(socket, name)]
+
+# Twilio request (connect, read) timeouts in seconds
+TWILIO_TIMEOUT = (3.05, 10)
+
+# Longest the scheduler sleeps between checks, so reminders added by other
+# processes (which cannot wake this one) are still picked up within a minute
+MAX_IDLE_SECONDS = 60
+
+# Most due reminders dispatched per wake-up; a full batch triggers another right away
+REMINDER_BATCH_SIZE = 500
+
+# A reminder whose send fails is retried after attempts * REMINDER_RETRY_BACKOFF
+# seconds, and marked 'failed' after REMINDER_MAX_ATTEMPTS failures
+REMINDER_RETRY_BACKOFF = 60
+REMINDER_MAX_ATTEMPTS = 5
+
+# Threads sending reminders concurrently; each keeps its own SMTP connection
+SEND_WORKERS = 8
+
+# Reminder emails share one HTML layout; only the heading (also the subject) and an
+# optional closing line differ per reminder type
+_TPL_BODY = Template("""
+            <html>
+            <body>
+                <h2>${heading}</h2>
+                <p>Hello ${name},</p>
+                <p>${message}</p>
+${footer}                <p>Best regards,<br>Onboarding Assistant</p>
+            </body>
+            </html>
+            """)
+_TPL = {
+    'task_reminder': ("Onboarding Task Reminder",
+                      "Please log in to your onboarding portal to complete this task."),
+    'welcome': ("Welcome to the Company!", "We're excited to have you on board!"),
+    'default': ("Onboarding Reminder", None),
+}
+# Heading and footer markup per type, rendered once
+_TPL_PARTS = {
+    reminder_type: (subject, {
+        'heading': subject,
+        'footer': f"                <p>{footer}</p>\n" if footer else "",
+    })
+    for reminder_type, (subject, footer) in _TPL.items()
+}
+
+# The subjects are a fixed set, so parse each into a header object once; EmailMessage
+# stores a prebuilt header as-is instead of re-parsing the string on every message
+_SUBJECT_HEADERS = {subject: policy.default.header_factory('Subject', subject)
+                    for subject, _ in _TPL.values()}
+
+
+@functools.lru_cache(maxsize=1)
+def _env_config() -> SimpleNamespace:
+    """Read the email/Twilio/simulation settings from the environment once per process."""
+    return SimpleNamespace(
+        smtp_server=os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+        smtp_port=int(os.getenv("SMTP_PORT", "587")),
+        email_user=os.getenv("EMAIL_USER"),
+        email_password=os.getenv("EMAIL_PASSWORD"),
+        twilio_account_sid=os.getenv("TWILIO_ACCOUNT_SID"),
+        twilio_auth_token=os.getenv("TWILIO_AUTH_TOKEN"),
+        twilio_whatsapp_from=os.getenv("TWILIO_WHATSAPP_FROM"),
+        simulate=os.getenv("SIMULATE_COMM", "false").lower() in ("1", "true", "yes"),
+    )
 
 
 class ReminderScheduler:
@@ -27,25 +116,119 @@ class ReminderScheduler:
                  twilio_auth_token: str = None,
                  twilio_whatsapp_from: str = None):
         """Initialize scheduler with email and WhatsApp credentials."""
-        self.db = Database()
+        self.db = get_db()
+        config = _env_config()
         
         # Email configuration
-        self.smtp_server = smtp_server or os.getenv("SMTP_SERVER", "smtp.gmail.com")
-        self.smtp_port = smtp_port or int(os.getenv("SMTP_PORT", "587"))
-        self.email_user = email_user or os.getenv("EMAIL_USER")
-        self.email_password = email_password or os.getenv("EMAIL_PASSWORD")
+        self.smtp_server = smtp_server or config.smtp_server
+        self.smtp_port = smtp_port or config.smtp_port
+        self.email_user = email_user or config.email_user
+        self.email_password = email_password or config.email_password
         
         # WhatsApp/Twilio configuration
-        self.twilio_account_sid = twilio_account_sid or os.getenv("TWILIO_ACCOUNT_SID")
-        self.twilio_auth_token = twilio_auth_token or os.getenv("TWILIO_AUTH_TOKEN")
-        self.twilio_whatsapp_from = twilio_whatsapp_from or os.getenv("TWILIO_WHATSAPP_FROM")
+        self.twilio_account_sid = twilio_account_sid or config.twilio_account_sid
+        self.twilio_auth_token = twilio_auth_token or config.twilio_auth_token
+        self.twilio_whatsapp_from = twilio_whatsapp_from or config.twilio_whatsapp_from
 
         # Simulation mode (if true, do not perform external sends; just log)
-        simulate = os.getenv("SIMULATE_COMM", "false").lower()
-        self.simulate = simulate in ("1", "true", "yes")
+        self.simulate = config.simulate
+        
+        # Parsed once, like the subjects, since every email has the same sender
+        self._from_header = (policy.default.header_factory('From', formataddr((None, self.email_user)))
+                             if self.email_user else None)
         
         self.running = False
         self.scheduler_thread = None
+        # Set to wake the scheduler thread early (new reminder or stop)
+        self._wake = threading.Event()
+        
+        # Sends are network-bound, so due reminders are dispatched from a small
+        # thread pool; Database connections are already per thread
+        self._pool = ThreadPoolExecutor(max_workers=SEND_WORKERS,
+                                        thread_name_prefix="reminder-send")
+        
+        # SMTP connection kept open for the duration of a _smtp_session batch
+        self._smtp_local = threading.local()
+        
+        # Keep-alive HTTPS pool for Twilio, so WhatsApp sends share one TLS session.
+        # Only retry POSTs Twilio cannot have acted on (connect errors, 429/503),
+        # so a retry never delivers the same message twice
+        self._http = requests.Session()
+        self._http.auth = (self.twilio_account_sid, self.twilio_auth_token)
+        self._http.mount("https://", HTTPAdapter(
+            pool_maxsize=16,
+            max_retries=Retry(total=3, read=0, backoff_factor=0.3,
+                              status_forcelist=[429, 503],
+                              allowed_methods=frozenset({"POST"}),
+                              raise_on_status=False)
+        ))
+    
+    def _build_message(self, to_email: str, subject: str, body: str) -> EmailMessage:
+        """Build the HTML email for one reminder (a single part, no multipart wrapper)."""
+        msg = EmailMessage()
+        msg['From'] = self._from_header or self.email_user
+        msg['To'] = to_email
+        msg['Subject'] = _SUBJECT_HEADERS.get(subject, subject)
+        msg.set_content(body, subtype='html')
+        return msg
+    
+    def _connect_smtp(self) -> smtplib.SMTP:
+        """Open an authenticated SMTP connection."""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=SMTP_TIMEOUT)
+        # Keepalive so a peer that silently disappears is noticed on a held connection
+        server.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option, value in _KEEPALIVE_OPTIONS:
+            server.sock.setsockopt(socket.IPPROTO_TCP, option, value)
+        server.starttls()
+        server.login(self.email_user, self.email_password)
+        return server
+    
+    @staticmethod
+    def _quit_smtp(server: smtplib.SMTP):
+        """Close an SMTP connection, ignoring errors from an already dropped peer."""
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+    
+    @contextmanager
+    def _smtp_session(self):
+        """Reuse one SMTP connection for every email sent inside the block.
+        
+        The connection is opened on the first send, so batches without email
+        (or in simulate mode) never connect.
+        """
+        session = self._smtp_local
+        session.active, session.server, session.sent = True, None, 0
+        try:
+            yield
+        finally:
+            if session.server is not None:
+                self._quit_smtp(session.server)
+            session.active, session.server = False, None
+    
+    def _send_with_session(self, msg: EmailMessage):
+        """Send msg over the batch connection, reconnecting when needed."""
+        session = self._smtp_local
+        if session.server is not None and session.sent >= SMTP_MESSAGES_PER_CONNECTION:
+            self._quit_smtp(session.server)
+            session.server = None
+        if session.server is None:
+            session.server, session.sent = self._connect_smtp(), 0
+        try:
+            session.server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Server dropped an idle or long-lived connection; retry once on a fresh one
+            session.server.close()
+            session.server, session.sent = self._connect_smtp(), 0
+            session.server.send_message(msg)
+        except OSError:
+            # Timed out or reset: drop the connection so the next send reconnects;
+            # the reminder stays pending and is retried on a later pass
+            session.server.close()
+            session.server = None
+            raise
+        session.sent += 1
     
     def send_email(self, to_email: str, subject: str, body: str) -> bool:
         """Send email reminder."""
@@ -58,17 +241,16 @@ class ReminderScheduler:
             return False
         
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.email_user
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'html'))
+            msg = self._build_message(to_email, subject, body)
             
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email_user, self.email_password)
-            server.send_message(msg)
-            server.quit()
+            if getattr(self._smtp_local, 'active', False):
+                self._send_with_session(msg)
+            else:
+                server = self._connect_smtp()
+                try:
+                    server.send_message(msg)
+                finally:
+                    self._quit_smtp(server)
             
             return True
         except Exception as e:
@@ -94,11 +276,7 @@ class ReminderScheduler:
                 'Body': message
             }
             
-            response = requests.post(
-                url,
-                auth=(self.twilio_account_sid, self.twilio_auth_token),
-                data=payload
-            )
+            response = self._http.post(url, data=payload, timeout=TWILIO_TIMEOUT)
             
             if response.status_code == 201:
                 return True
@@ -109,58 +287,38 @@ class ReminderScheduler:
             print(f"Error sending WhatsApp: {e}")
             return False
     
-    def send_reminder(self, reminder: Dict) -> bool:
-        """Send a reminder via the specified channel."""
-        employee = self.db.get_employee(reminder['employee_id'])
+    def send_reminder(self, reminder: Dict, employee: Optional[Dict] = None,
+                      mark_sent: bool = True) -> bool:
+        """Send a reminder via the specified channel.
+        
+        Pass the reminder's employee if already loaded; otherwise it is looked up.
+        With mark_sent=False the caller records successful sends itself.
+        """
+        if employee is None:
+            employee = self.db.get_employee(reminder['employee_id'])
         if not employee:
             return False
         
         # Get reminder message
         message = reminder['message']
         reminder_type = reminder['reminder_type']
+        channel = reminder.get('channel', 'email')
+        
+        if self.simulate:
+            # Nothing is sent, so skip rendering the body altogether
+            print(f"[SIMULATE] Would send {reminder_type} reminder via {channel} "
+                  f"to {reminder['employee_id']}")
+            if mark_sent:
+                self.db.mark_reminder_sent(reminder['id'])
+            return True
         
         # Format message based on type
-        if reminder_type == 'task_reminder':
-            subject = "Onboarding Task Reminder"
-            body = f"""
-            <html>
-            <body>
-                <h2>Onboarding Task Reminder</h2>
-                <p>Hello {employee['name']},</p>
-                <p>{message}</p>
-                <p>Please log in to your onboarding portal to complete this task.</p>
-                <p>Best regards,<br>Onboarding Assistant</p>
-            </body>
-            </html>
-            """
-        elif reminder_type == 'welcome':
-            subject = "Welcome to the Company!"
-            body = f"""
-            <html>
-            <body>
-                <h2>Welcome to the Company!</h2>
-                <p>Hello {employee['name']},</p>
-                <p>{message}</p>
-                <p>We're excited to have you on board!</p>
-                <p>Best regards,<br>Onboarding Assistant</p>
-            </body>
-            </html>
-            """
-        else:
-            subject = "Onboarding Reminder"
-            body = f"""
-            <html>
-            <body>
-                <h2>Onboarding Reminder</h2>
-                <p>Hello {employee['name']},</p>
-                <p>{message}</p>
-                <p>Best regards,<br>Onboarding Assistant</p>
-            </body>
-            </html>
-            """
+        subject, parts = _TPL_PARTS.get(reminder_type, _TPL_PARTS['default'])
+        # Escape the employee's name and the message so they can't inject markup
+        body = _TPL_BODY.substitute(parts, name=html.escape(employee['name'], quote=False),
+                                    message=html.escape(message, quote=False))
         
         success = False
-        channel = reminder.get('channel', 'email')
         
         if channel == 'email':
             success = self.send_email(employee['email'], subject, body)
@@ -173,30 +331,72 @@ class ReminderScheduler:
                 whatsapp_success = self.send_whatsapp(employee['phone'], message)
             success = email_success or whatsapp_success
         
-        if success:
+        if success and mark_sent:
             self.db.mark_reminder_sent(reminder['id'])
         
         return success
     
-    def process_pending_reminders(self):
-        """Process all pending reminders that are due."""
-        now = datetime.now().isoformat()
-        pending_reminders = self.db.get_pending_reminders(now)
+    def _send_batch(self, reminders: List[Dict], employees: Dict[str, Dict]) -> List[int]:
+        """Send reminders in order over one SMTP session; returns the ids that were sent."""
+        sent_ids = []
+        with self._smtp_session():
+            for reminder in reminders:
+                try:
+                    if self.send_reminder(reminder, employees.get(reminder['employee_id'], {}),
+                                          mark_sent=False):
+                        sent_ids.append(reminder['id'])
+                except Exception as e:
+                    # Keep going so the ids already sent are still recorded
+                    print(f"Error sending reminder {reminder['id']}: {e}")
+        return sent_ids
+    
+    def process_pending_reminders(self) -> int:
+        """Process pending reminders that are due, up to REMINDER_BATCH_SIZE of them.
         
-        for reminder in pending_reminders:
-            self.send_reminder(reminder)
+        Returns how many were sent.
+        """
+        now = datetime.now().isoformat()
+        # Claim the batch atomically so an overlapping pass cannot send the same reminders
+        claim_token = uuid.uuid4().hex
+        reminders = self.db.claim_pending_reminders(now, claim_token, REMINDER_BATCH_SIZE,
+                                                    retry_backoff=REMINDER_RETRY_BACKOFF)
+        if not reminders:
+            return 0
+        # One query for every employee in the batch instead of one per reminder
+        employees = {e['employee_id']: e for e in self.db.get_employees_by_ids(
+            {r['employee_id'] for r in reminders})}
+        # Deal the batch out to the workers; each logs in to SMTP once for its share
+        workers = min(SEND_WORKERS, len(reminders))
+        shares = [reminders[i::workers] for i in range(workers)]
+        sent_ids = [reminder_id
+                    for share_ids in self._pool.map(self._send_batch, shares, repeat(employees))
+                    for reminder_id in share_ids]
+        # Record the whole batch in one transaction rather than one commit per send,
+        # and hand back the ones that failed so a later pass retries them
+        self.db.mark_reminders_sent(sent_ids, claim_token)
+        sent_set = set(sent_ids)
+        self.db.release_reminders([r['id'] for r in reminders if r['id'] not in sent_set],
+                                  claim_token, max_attempts=REMINDER_MAX_ATTEMPTS)
+        sent = len(sent_ids)
+        if sent and len(reminders) == REMINDER_BATCH_SIZE:
+            # More may be due; go again now rather than after the idle wait
+            self._wake.set()
+        return sent
     
     def schedule_reminder(self, employee_id: str, reminder_type: str,
                          message: str, scheduled_time: str, 
                          channel: str = 'email'):
         """Schedule a new reminder."""
-        return self.db.add_reminder(
+        reminder_id = self.db.add_reminder(
             employee_id=employee_id,
             reminder_type=reminder_type,
             message=message,
             scheduled_time=scheduled_time,
             channel=channel
         )
+        # The new reminder may be due before the one the scheduler is sleeping on
+        self._wake.set()
+        return reminder_id
     
     def schedule_welcome_reminder(self, employee_id: str, start_date: str):
         """Schedule welcome reminder for new employee."""
@@ -212,20 +412,22 @@ class ReminderScheduler:
     
     def schedule_task_reminders(self, employee_id: str, task_due_dates: Dict[str, str]):
         """Schedule reminders for specific tasks."""
+        # One narrow query for all tasks instead of a full progress fetch per task
+        tasks = {task_id: (name, status)
+                 for task_id, name, status in self.db.get_progress_summary(employee_id)}
+        reminders = []
         for task_id, due_date in task_due_dates.items():
-            progress = self.db.get_progress(employee_id)
-            task = next((t for t in progress if t['task_id'] == task_id), None)
+            task_name, status = tasks.get(task_id, (None, None))
             
-            if task and task['status'] == 'pending':
+            if status == 'pending':
                 reminder_time = datetime.fromisoformat(due_date) - timedelta(days=1)
-                message = f"Reminder: Don't forget to complete '{task['task_name']}' by {due_date}."
-                self.schedule_reminder(
-                    employee_id=employee_id,
-                    reminder_type='task_reminder',
-                    message=message,
-                    scheduled_time=reminder_time.isoformat(),
-                    channel='email'
-                )
+                message = f"Reminder: Don't forget to complete '{task_name}' by {due_date}."
+                reminders.append((employee_id, 'task_reminder', message,
+                                  reminder_time.isoformat(), 'email'))
+        # All of the employee's task reminders in one transaction
+        self.db.add_reminders(reminders)
+        if reminders:
+            self._wake.set()
     
     def start_scheduler(self):
         """Start the background scheduler thread."""
@@ -234,22 +436,42 @@ class ReminderScheduler:
         
         self.running = True
         
-        # Schedule reminder processing every minute
-        schedule.every(1).minutes.do(self.process_pending_reminders)
-        
         def run_scheduler():
+            # Sleep until the next reminder is due (or a new one is scheduled)
+            # rather than polling every second
             while self.running:
-                schedule.run_pending()
-                time.sleep(1)
+                self._wake.wait(timeout=self._seconds_until_next_reminder())
+                self._wake.clear()
+                if self.running:
+                    self.process_pending_reminders()
         
         self.scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
         self.scheduler_thread.start()
         print("Reminder scheduler started.")
     
+    def _seconds_until_next_reminder(self) -> float:
+        """Seconds until the next pending reminder is due, capped at MAX_IDLE_SECONDS.
+        
+        Reminders already overdue (their send failed) are only retried on the
+        regular MAX_IDLE_SECONDS wake-up, so a failing one cannot spin the loop.
+        """
+        now = datetime.now()
+        next_due = self.db.get_next_reminder_time(now.isoformat())
+        if not next_due:
+            return MAX_IDLE_SECONDS
+        try:
+            delay = (datetime.fromisoformat(next_due) - now).total_seconds()
+        except (ValueError, TypeError):
+            return MAX_IDLE_SECONDS
+        return min(max(delay, 0), MAX_IDLE_SECONDS)
+    
     def stop_scheduler(self):
         """Stop the background scheduler thread."""
         self.running = False
+        self._wake.set()
         if self.scheduler_thread:
             self.scheduler_thread.join(timeout=5)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._http.close()
         print("Reminder scheduler stopped.")
 
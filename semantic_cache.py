@@ -0,0 +1,92 @@
+"""
+Semantic response cache for answering repeated or paraphrased questions without an LLM call.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """In-memory cache keyed on L2-normalized question embeddings.
+    
+    Entries are stored as rows of a single matrix so a lookup is one
+    matrix-vector product. An optional scope (e.g. the employee context)
+    restricts matches to entries stored under the same scope. With ttl
+    (seconds), entries older than that are no longer matched.
+    """
+    
+    def __init__(self, threshold: float = 0.92, max_entries: int = 512,
+                 ttl: Optional[float] = None):
+        """Initialize an empty cache."""
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._scope_col = np.empty(0, dtype=np.int32)
+        self._added_at = np.empty(0, dtype=np.float64)
+        self._scope_ids: Dict[Hashable, int] = {}
+        self._values: List[Any] = []
+    
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        """Return the embedding as a unit-length float32 vector."""
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+    
+    def lookup(self, embedding, scope: Hashable = None) -> Optional[Any]:
+        """Return the cached value for the closest stored embedding, if similar enough."""
+        q_emb = self._normalize(embedding)
+        with self._lock:
+            if not self._values or scope not in self._scope_ids:
+                return None
+            scores = self._matrix @ q_emb
+            scores[self._scope_col != self._scope_ids[scope]] = -1.0
+            if self.ttl is not None:
+                scores[self._added_at < time.monotonic() - self.ttl] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                return self._values[best]
+        return None
+    
+    def add(self, embedding, value: Any, scope: Hashable = None):
+        """Store a value, evicting the oldest entry when the cache is full."""
+        q_emb = self._normalize(embedding)[np.newaxis, :]
+        now = time.monotonic()
+        with self._lock:
+            scope_id = self._scope_ids.setdefault(scope, len(self._scope_ids))
+            if self._matrix is None or self._matrix.shape[1] != q_emb.shape[1]:
+                # First entry (or embedding model changed): start a fresh matrix
+                self._matrix = q_emb
+                self._scope_col = np.array([scope_id], dtype=np.int32)
+                self._added_at = np.array([now], dtype=np.float64)
+                self._values = [value]
+                return
+            
+            self._matrix = np.vstack([self._matrix, q_emb])
+            self._scope_col = np.append(self._scope_col, np.int32(scope_id))
+            self._added_at = np.append(self._added_at, now)
+            self._values.append(value)
+            
+            overflow = len(self._values) - self.max_entries
+            if overflow > 0:
+                self._matrix = self._matrix[overflow:]
+                self._scope_col = self._scope_col[overflow:]
+                self._added_at = self._added_at[overflow:]
+                del self._values[:overflow]
+    
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._matrix = None
+            self._scope_col = np.empty(0, dtype=np.int32)
+            self._added_at = np.empty(0, dtype=np.float64)
+            self._scope_ids.clear()
+            self._values = []
+    
+    def __len__(self) -> int:
+        return len(self._values)
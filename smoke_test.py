@@ -9,18 +9,20 @@ print('OPENAI preview:', (os.getenv('OPENAI_API_KEY') or '<empty>')[:6] + '...'
 print('SMTP set:', bool(os.getenv('EMAIL_USER')))
 print('SIMULATE_COMM:', os.getenv('SIMULATE_COMM'))
 
-# Check Streamlit process
+# Check Streamlit by connecting to its port rather than scanning every process
+import socket
+streamlit_port = int(os.getenv('STREAMLIT_SERVER_PORT', '8501'))
 try:
-    import psutil
-    streamlit_running = any('streamlit' in ' '.join(p.cmdline()).lower() for p in psutil.process_iter())
-    print('Streamlit running (psutil):', streamlit_running)
-except Exception:
-    print('psutil not available; skipping process check')
+    socket.create_connection(('127.0.0.1', streamlit_port), timeout=0.2).close()
+    streamlit_running = True
+except OSError:
+    streamlit_running = False
+print(f'Streamlit running (port {streamlit_port}):', streamlit_running)
 
 # Import project modules and show basic state
 try:
-    from db import Database
-    db = Database()
+    from db import get_db
+    db = get_db()
     emps = db.get_all_employees()
     docs = db.get_documents()
     reminders = db.get_pending_reminders('9999-01-01T00:00:00')